@@ -0,0 +1,266 @@
+"""Differential fuzzing of move generation backends.
+
+Random legal games are played across a pool of worker processes. At every
+position the reference implementation, a freshly loaded uncached `Board`
+asking each `Piece` for its legal moves, is compared against a backend:
+
+    python -m benchmarks.fuzz                       # every backend
+    python -m benchmarks.fuzz movegen --games 200 --processes 8
+
+A backend is a function from a FEN to a `Summary` of the position: its legal
+moves, whether the side to move is in check, and its hash. Register new ones
+in `BACKENDS`. The incrementally updated hash of the board the game is played
+on is checked against the reference too.
+
+Each mismatching position is shrunk to a minimal FEN that still shows the
+mismatch, by removing pieces, castling rights and the en passant square one
+at a time. Positions checked per second are reported, so a run doubles as a
+stress benchmark. The exit status is 1 if there were any mismatches.
+"""
+import argparse
+import collections
+import multiprocessing
+import random
+import sys
+import timeit
+
+from botetourt import fen, movegen
+from botetourt.board import Board
+from botetourt.consts import WHITE, BLACK
+from botetourt.pieces import Pawn, PROMOTION_PIECES
+
+
+DEFAULT_GAMES = 50
+DEFAULT_MAX_PLIES = 200
+
+Summary = collections.namedtuple('Summary', ['moves', 'in_check', 'hash'])
+
+# A position where `backend` disagreed with the reference. `shrunk` is the
+# smallest position found that still disagrees.
+Mismatch = collections.namedtuple('Mismatch', ['backend', 'fen', 'shrunk',
+                                               'differences'])
+
+
+def _summarize(board, moves):
+    return Summary(frozenset(moves), board.king_safety(board.turn).in_check,
+                   board.hash)
+
+
+def _piece_moves(board):
+    """Legal moves of the side to move, from `Piece.get_legal_moves`."""
+    for piece in board.get_pieces_by_color(board.turn):
+        for new_file, new_rank in piece.get_legal_moves():
+            move = (piece.file, piece.rank, new_file, new_rank)
+            if (piece.__class__ == Pawn and
+                    new_rank == Pawn.PROMOTION_RANK[piece.color]):
+                for promotion in PROMOTION_PIECES:
+                    yield move + (promotion,)
+            else:
+                yield move
+
+
+def reference(position):
+    board = fen.load(Board(cache_size=0), position)
+    return _summarize(board, _piece_moves(board))
+
+
+def staged_moves(position):
+    board = fen.loads(position)
+    return _summarize(board, [move for _, move
+                              in movegen.staged_moves(board)])
+
+
+def copied_board(position):
+    board = fen.loads(position).copy()
+    return _summarize(board, _piece_moves(board))
+
+
+BACKENDS = {
+    'movegen': staged_moves,
+    'copy': copied_board,
+}
+
+
+def compare(expected, actual):
+    """Return a dict describing how two summaries differ, empty if they
+    agree.
+    """
+    differences = {}
+    missing = expected.moves - actual.moves
+    extra = actual.moves - expected.moves
+    if missing:
+        differences['missing'] = sorted(map(movegen.format_move, missing))
+    if extra:
+        differences['extra'] = sorted(map(movegen.format_move, extra))
+    if expected.in_check != actual.in_check:
+        differences['in_check'] = (expected.in_check, actual.in_check)
+    if expected.hash != actual.hash:
+        differences['hash'] = (expected.hash, actual.hash)
+    return differences
+
+
+def _differences(backend, position):
+    try:
+        return compare(reference(position), BACKENDS[backend](position))
+    except Exception as e:
+        return {'error': '%s: %s' % (e.__class__.__name__, e)}
+
+
+def _is_valid(board):
+    """Whether both kings are on the board and the side that just moved
+    isn't left in check.
+    """
+    kings = [piece.color for piece in board._get_pieces()
+             if piece.SYMBOL == 'K']
+    if sorted(kings) != sorted([WHITE, BLACK]):
+        return False
+    other = BLACK if board.turn == WHITE else WHITE
+    return not board.king_safety(other).in_check
+
+
+def _simplifications(position):
+    """Yield positions with one thing fewer than `position`."""
+    board = fen.loads(position)
+    for piece in list(board._get_pieces()):
+        if piece.SYMBOL == 'K':
+            continue
+        candidate = fen.loads(position)
+        candidate.remove_piece(piece.file, piece.rank)
+        yield candidate
+
+    if board.castling_rights:
+        candidate = fen.loads(position)
+        candidate._set_castling_rights(0)
+        yield candidate
+
+    if board.en_passant:
+        candidate = fen.loads(position)
+        candidate._set_en_passant(None)
+        yield candidate
+
+
+def shrink(backend, position):
+    """Return the smallest position reachable from `position` by removing
+    pieces, castling rights or the en passant square for which `backend`
+    still disagrees with the reference.
+    """
+    shrunk = True
+    while shrunk:
+        shrunk = False
+        for candidate in _simplifications(position):
+            if not _is_valid(candidate):
+                continue
+            candidate_fen = fen.dumps(candidate)
+            if _differences(backend, candidate_fen):
+                position = candidate_fen
+                shrunk = True
+                break
+    return position
+
+
+def play_game(backends, seed, max_plies=DEFAULT_MAX_PLIES):
+    """Play a random game, checking every position against `backends`.
+
+    Returns (positions checked, mismatches).
+    """
+    rng = random.Random(seed)
+    board = fen.loads(fen.STARTING_POSITION)
+    positions = 0
+    mismatches = []
+
+    for _ in range(max_plies + 1):
+        position = fen.dumps(board)
+        expected = reference(position)
+        positions += 1
+
+        if board.hash != expected.hash:
+            mismatches.append(Mismatch('incremental', position, position, {
+                'hash': (expected.hash, board.hash)}))
+
+        for backend in backends:
+            differences = _differences(backend, position)
+            if differences:
+                mismatches.append(Mismatch(backend, position,
+                                           shrink(backend, position),
+                                           differences))
+
+        if (not expected.moves or board.halfmove_clock >= 100 or
+                len(list(board._get_pieces())) == 2):
+            break
+        move = rng.choice(sorted(expected.moves, key=movegen.format_move))
+        board.make_move(*move)
+
+    return positions, mismatches
+
+
+def _play_game(args):
+    return play_game(*args)
+
+
+def run(backends, games=DEFAULT_GAMES, max_plies=DEFAULT_MAX_PLIES,
+        processes=None, seed=0):
+    """Play `games` random games across `processes` worker processes.
+
+    Returns (positions checked, mismatches, seconds).
+    """
+    jobs = [(backends, seed + game, max_plies) for game in range(games)]
+    start = timeit.default_timer()
+
+    if processes == 1:
+        results = map(_play_game, jobs)
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = list(pool.imap_unordered(_play_game, jobs))
+        finally:
+            pool.close()
+            pool.join()
+
+    positions = 0
+    mismatches = []
+    for game_positions, game_mismatches in results:
+        positions += game_positions
+        mismatches.extend(game_mismatches)
+    return positions, mismatches, timeit.default_timer() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('backends', nargs='*',
+                        help='backends to check, out of %s (default: all)' %
+                        ', '.join(sorted(BACKENDS)))
+    parser.add_argument('--games', type=int, default=DEFAULT_GAMES)
+    parser.add_argument('--max-plies', type=int, default=DEFAULT_MAX_PLIES)
+    parser.add_argument('--processes', type=int,
+                        help='worker processes (default: one per CPU)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    for backend in args.backends:
+        if backend not in BACKENDS:
+            parser.error('unknown backend %r' % backend)
+    backends = args.backends or sorted(BACKENDS)
+    positions, mismatches, seconds = run(
+        backends, games=args.games, max_plies=args.max_plies,
+        processes=args.processes, seed=args.seed)
+
+    # Different games often run into the same bug
+    seen = set()
+    for mismatch in mismatches:
+        if (mismatch.backend, mismatch.shrunk) in seen:
+            continue
+        seen.add((mismatch.backend, mismatch.shrunk))
+        print('%s: %s' % (mismatch.backend, mismatch.fen))
+        print('  shrunk: %s' % mismatch.shrunk)
+        for name, value in sorted(mismatch.differences.items()):
+            print('  %s: %s' % (name, value))
+
+    print('%d games, %d positions in %.2fs (%.0f positions/s), '
+          '%d mismatches' % (args.games, positions, seconds,
+                             positions / seconds if seconds else 0,
+                             len(mismatches)))
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
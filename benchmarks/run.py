@@ -0,0 +1,333 @@
+"""Microbenchmarks for the board and move generation.
+
+Each benchmark reports the best-of-N time per operation. Results are written
+as JSON and compared against a stored baseline so that regressions in
+`board.py` or `pieces.py` show up before they ship:
+
+    python -m benchmarks.run                    # compare against baseline
+    python -m benchmarks.run --save-baseline    # record a new baseline
+    python -m benchmarks.run --output results.json
+
+Import times of the modules worker processes load on startup are measured
+in a fresh interpreter for each sample, and are also checked against a fixed
+budget in `IMPORT_BUDGETS`.
+
+The exit status is 1 if any benchmark is slower than its baseline by more
+than `--threshold`, or if an import is over budget.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+from StringIO import StringIO
+
+from botetourt import fen, gamefile, pgn
+from botetourt.board import Board, WHITE, BLACK
+from botetourt.consts import FILES, RANKS
+from botetourt.pieces import PIECES_BY_SYMBOL, Queen
+
+from benchmarks import positions
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Seconds allowed to import each module, not counting interpreter startup
+IMPORT_BUDGETS = {
+    'botetourt.board': 0.025,
+    'botetourt.search': 0.025,
+    'botetourt.service': 0.050,
+}
+
+
+def _boards(fens, cache_size=0):
+    # Uncached by default so that generation cost is what gets measured
+    return [fen.load(Board(cache_size=cache_size), position)
+            for position in fens]
+
+
+def _all_fens():
+    return [position for _, fens in positions.PHASES for position in fens]
+
+
+def bench_setup_pieces():
+    def run():
+        Board().setup_pieces()
+    return run, 1
+
+
+def bench_move_piece():
+    board = fen.load(Board(cache_size=0), fen.STARTING_POSITION)
+    moves = [('b', 1, 'c', 3), ('b', 8, 'c', 6),
+             ('c', 3, 'b', 1), ('c', 6, 'b', 8)]
+
+    def run():
+        for move in moves:
+            board.move_piece(*move)
+    return run, len(moves)
+
+
+def bench_copy(materialize=False):
+    board = _boards(positions.MIDDLEGAMES)[0]
+
+    def run():
+        clone = board.copy()
+        if materialize:
+            clone['a'][1]
+    return run, 1
+
+
+def bench_legal_moves(piece_class, cache_size=0):
+    pieces = [piece for board in _boards(_all_fens(), cache_size=cache_size)
+              for piece in board._get_pieces()
+              if piece.__class__ == piece_class]
+
+    def run():
+        for piece in pieces:
+            piece.get_legal_moves()
+    return run, len(pieces)
+
+
+def bench_attacked_squares(fens):
+    boards = _boards(fens)
+
+    def run():
+        for board in boards:
+            board.attacked_squares(WHITE)
+            board.attacked_squares(BLACK)
+    return run, 2 * len(boards)
+
+
+def bench_mobility(fens):
+    pieces = [(board, piece) for board in _boards(fens)
+              for piece in board._get_pieces()]
+
+    def run():
+        for board, piece in pieces:
+            board.mobility(piece)
+    return run, len(pieces)
+
+
+def bench_attackers_of(fens):
+    boards = _boards(fens)
+    squares = [(file, rank) for file in FILES for rank in RANKS]
+
+    def run():
+        for board in boards:
+            for square in squares:
+                board.attackers_of(square, WHITE)
+                board.attackers_of(square, BLACK)
+    return run, 2 * len(boards) * len(squares)
+
+
+def bench_is_checkmated(fens):
+    kings = []
+    for board in _boards(fens):
+        for piece in board.get_pieces_by_color(board.turn):
+            if piece.SYMBOL == 'K':
+                kings.append(piece)
+
+    def run():
+        for king in kings:
+            king.is_checkmated()
+    return run, len(kings)
+
+
+def bench_fen_round_trip():
+    fens = _all_fens()
+
+    def run():
+        for position in fens:
+            fen.dumps(fen.loads(position))
+    return run, len(fens)
+
+
+def bench_pgn_replay():
+    games = list(pgn.read_games(StringIO(positions.GAMES)))
+
+    def run():
+        for game in games:
+            for _ in pgn.replay(game.new_board(), game.moves):
+                pass
+    return run, sum(len(game.moves) for game in games)
+
+
+def bench_gamefile_replay():
+    data = StringIO()
+    gamefile.convert(StringIO(positions.GAMES), data)
+    games = list(gamefile.read_games(StringIO(data.getvalue())))
+
+    def run():
+        for game in games:
+            for _ in game.replay():
+                pass
+    return run, sum(game.num_moves for game in games)
+
+
+def get_benchmarks():
+    """Return a list of (name, factory) pairs. Each factory returns the
+    function to time and the number of operations one call performs.
+    """
+    benchmarks = [
+        ('setup_pieces', bench_setup_pieces),
+        ('move_piece', bench_move_piece),
+        ('copy', bench_copy),
+        ('copy.materialize', lambda: bench_copy(materialize=True)),
+    ]
+    for symbol in 'PNBRQK':
+        piece_class = PIECES_BY_SYMBOL[symbol]
+        benchmarks.append(
+            ('legal_moves.%s' % piece_class.__name__,
+             lambda piece_class=piece_class: bench_legal_moves(piece_class)))
+    benchmarks.append(('legal_moves.cached',
+                       lambda: bench_legal_moves(Queen, cache_size=4096)))
+    for phase, fens in positions.PHASES:
+        benchmarks.append(('attacked_squares.%s' % phase,
+                           lambda fens=fens: bench_attacked_squares(fens)))
+        benchmarks.append(('mobility.%s' % phase,
+                           lambda fens=fens: bench_mobility(fens)))
+        benchmarks.append(('attackers_of.%s' % phase,
+                           lambda fens=fens: bench_attackers_of(fens)))
+        benchmarks.append(('is_checkmated.%s' % phase,
+                           lambda fens=fens: bench_is_checkmated(fens)))
+    benchmarks.append(('fen_round_trip', bench_fen_round_trip))
+    benchmarks.append(('pgn_replay', bench_pgn_replay))
+    benchmarks.append(('gamefile_replay', bench_gamefile_replay))
+    return benchmarks
+
+
+def time_per_op(func, ops, repeat=5, min_time=0.05):
+    """Return the best time in seconds for a single operation."""
+    timer = timeit.Timer(func)
+
+    # Calibrate so each sample runs for at least `min_time`
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2
+
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / (number * ops)
+
+
+def time_import(module, repeat=5):
+    """Return the best time in seconds to import `module` in a fresh
+    interpreter.
+    """
+    code = ('from timeit import default_timer; start = default_timer(); '
+            'import %s; print(repr(default_timer() - start))' % module)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return min(float(subprocess.check_output([sys.executable, '-c', code],
+                                             cwd=root))
+               for _ in range(repeat))
+
+
+def run_benchmarks(names=None, repeat=5, min_time=0.05):
+    def selected(name):
+        return not names or any(name.startswith(n) for n in names)
+
+    results = {}
+    for name, factory in get_benchmarks():
+        if not selected(name):
+            continue
+        func, ops = factory()
+        results[name] = time_per_op(func, ops, repeat=repeat,
+                                    min_time=min_time)
+    for module in sorted(IMPORT_BUDGETS):
+        name = 'import.%s' % module
+        if selected(name):
+            # Far noisier than the in-process benchmarks, so take more samples
+            results[name] = time_import(module, repeat=repeat * 4)
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'results': results,
+    }
+
+
+def _over_budget(name, seconds):
+    if not name.startswith('import.'):
+        return False
+    return seconds > IMPORT_BUDGETS.get(name[len('import.'):], seconds)
+
+
+def compare(results, baseline, threshold):
+    """Return a list of (name, seconds, baseline seconds, ratio, failure)
+    for each benchmark in `results`. `failure` is '', 'REGRESSION' or
+    'OVER BUDGET'.
+    """
+    rows = []
+    for name in sorted(results['results']):
+        seconds = results['results'][name]
+        base = baseline['results'].get(name)
+        ratio = seconds / base if base else None
+
+        failure = ''
+        if _over_budget(name, seconds):
+            failure = 'OVER BUDGET'
+        elif ratio is not None and ratio > 1 + threshold:
+            failure = 'REGRESSION'
+        rows.append((name, seconds, base, ratio, failure))
+    return rows
+
+
+def format_rows(rows):
+    lines = ['%-30s %12s %12s %8s' % ('benchmark', 'us/op', 'baseline',
+                                       'ratio')]
+    for name, seconds, base, ratio, failure in rows:
+        if base is None:
+            base_str = ratio_str = '-'
+        else:
+            base_str = '%.2f' % (base * 1e6)
+            ratio_str = '%.2fx' % ratio
+        lines.append('%-30s %12.2f %12s %8s%s' % (
+            name, seconds * 1e6, base_str, ratio_str,
+            '  ' + failure if failure else ''))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('names', nargs='*',
+                        help='only run benchmarks starting with these names')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='write the results to the baseline file')
+    parser.add_argument('--output', help='write the results as JSON here')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed slowdown before failing (0.25 = 25%%)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.names, repeat=args.repeat,
+                             min_time=args.min_time)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    baseline = {'results': {}}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    rows = compare(results, baseline, args.threshold)
+    print(format_rows(rows))
+
+    if any(failure for _, _, _, _, failure in rows):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,145 @@
+import collections
+
+from botetourt import checks, tables, zobrist
+from botetourt.cache import PositionCache, DEFAULT_MAXSIZE, cached_by_args
 from botetourt.exc import MoveNotAllowed, NoPieceThere
-from botetourt.consts import WHITE, BLACK, FILES, RANKS
-from botetourt.pieces import Queen, Pawn
+from botetourt.consts import (WHITE, BLACK, FILES, RANKS, WHITE_KING_SIDE,
+                              WHITE_QUEEN_SIDE, BLACK_KING_SIDE,
+                              BLACK_QUEEN_SIDE, ALL_CASTLING_RIGHTS)
+from botetourt.pieces import (Bishop, King, Knight, Pawn, Queen, Rook,
+                              PIECES_BY_SYMBOL, PROMOTION_PIECES)
+from botetourt.tables import ORTHOGONAL, DIAGONAL, DIRECTIONS, SQUARE_BITS
+
+
+# Any move from or to one of these squares revokes the given castling rights
+CASTLING_RIGHTS_REVOKED = {
+    ('e', 1): WHITE_KING_SIDE | WHITE_QUEEN_SIDE,
+    ('h', 1): WHITE_KING_SIDE,
+    ('a', 1): WHITE_QUEEN_SIDE,
+    ('e', 8): BLACK_KING_SIDE | BLACK_QUEEN_SIDE,
+    ('h', 8): BLACK_KING_SIDE,
+    ('a', 8): BLACK_QUEEN_SIDE,
+}
+
+
+# Directions each slider attacks along, and the sliders attacking along each
+# direction
+SLIDER_DIRECTIONS = {Bishop: DIAGONAL, Rook: ORTHOGONAL, Queen: DIRECTIONS}
+DIRECTION_SLIDERS = dict(
+    [(direction, (Rook, Queen)) for direction in ORTHOGONAL] +
+    [(direction, (Bishop, Queen)) for direction in DIAGONAL])
+
+# Immutable, compact description of a position. `placement` has one character
+# per square, file by file, using the piece symbols ('.' for empty).
+Snapshot = collections.namedtuple('Snapshot', [
+    'placement', 'turn', 'castling_rights', 'en_passant', 'halfmove_clock',
+    'fullmove_number', 'hash'])
+
+EMPTY = '.'
+
+# The rank a pawn that just pushed two squares stands on and the symbol of
+# the pawns that could capture it, by en passant rank
+EN_PASSANT_CAPTURERS = {3: (4, 'p'), 6: (5, 'P')}
+
+
+def _en_passant_key(square, symbol_at):
+    """Return the hash key for the en passant `square`, or 0 if no pawn
+    can capture en passant. Otherwise the same position would hash
+    differently depending on whether its last move was a double push.
+
+    `symbol_at(file, rank)` returns the symbol of the piece on a square.
+    """
+    if not square:
+        return 0
+    file, rank = square
+    pawn_rank, capturer = EN_PASSANT_CAPTURERS.get(rank, (None, None))
+    file_idx = FILES.index(file)
+    for idx in (file_idx - 1, file_idx + 1):
+        if (0 <= idx < len(FILES) and
+                symbol_at(FILES[idx], pawn_rank) == capturer):
+            return zobrist.EN_PASSANT[file]
+    return 0
 
 
 class Board(object):
-    def __init__(self):
+    def __init__(self, cache_size=DEFAULT_MAXSIZE):
+        # Generated moves and attack sets, see `botetourt.cache`
+        self.cache = PositionCache(maxsize=cache_size)
+        self._placement = None
         self.clear()
 
+    def snapshot(self):
+        """Return an immutable `Snapshot` of the position."""
+        placement = self._placement
+        if placement is None or placement[0] != self.hash:
+            state = self.state
+            placement = (self.hash, ''.join(
+                str(state[file][rank] or EMPTY)
+                for file in FILES for rank in RANKS))
+            self._placement = placement
+
+        return Snapshot(placement[1], self.turn, self.castling_rights,
+                        self.en_passant, self.halfmove_clock,
+                        self.fullmove_number, self.hash)
+
+    @classmethod
+    def from_snapshot(cls, snapshot, cache=None):
+        """Return a board for `snapshot`. Its pieces are only created once
+        the board is first looked at, so this is O(1).
+        """
+        board = _UnmaterializedBoard.__new__(_UnmaterializedBoard)
+        board._board_class = cls
+        board.cache = cache if cache is not None else PositionCache()
+        board._placement = (snapshot.hash, snapshot.placement)
+        board.captured_pieces = {WHITE: [], BLACK: []}
+        board.history = []
+        (_, board.turn, board.castling_rights, board.en_passant,
+         board.halfmove_clock, board.fullmove_number, board.hash) = snapshot
+        board._en_passant_hash = _en_passant_key(
+            board.en_passant, lambda file, rank: snapshot.placement[
+                FILES.index(file) * len(RANKS) + RANKS.index(rank)])
+        return board
+
+    def copy(self, share_cache=False):
+        """Return a copy-on-write clone of this board.
+
+        The clone shares this board's snapshot and only creates its own
+        pieces once it is used. Its history is empty, so moves made before
+        the copy can't be unmade on it.
+
+        The clone gets an empty move cache of the same size unless
+        `share_cache` is true. A shared cache is cleared, and counts hits
+        and misses, for both boards, and isn't safe to use from several
+        threads.
+        """
+        if share_cache:
+            cache = self.cache
+        else:
+            cache = PositionCache(maxsize=self.cache.maxsize)
+        board = self.from_snapshot(self.snapshot(), cache=cache)
+        board.captured_pieces = {WHITE: list(self.captured_pieces[WHITE]),
+                                 BLACK: list(self.captured_pieces[BLACK])}
+        return board
+
+    def _materialize(self):
+        placement = self._placement[1]
+        state = {}
+        idx = 0
+        for file in FILES:
+            state[file] = squares = {}
+            for rank in RANKS:
+                symbol = placement[idx]
+                idx += 1
+                if symbol == EMPTY:
+                    squares[rank] = None
+                else:
+                    color = WHITE if symbol.isupper() else BLACK
+                    piece_class = PIECES_BY_SYMBOL[symbol.upper()]
+                    squares[rank] = piece_class(self, color, file, rank)
+        self.state = state
+        self.__class__ = self._board_class
+        return state
+
     def as_grid(self):
         ranks = []
         for rank in reversed(RANKS):
@@ -53,12 +186,89 @@ class Board(object):
 
         self.captured_pieces = {WHITE: [], BLACK: []}
 
+        # Move state: kept up to date by `move_piece` and folded into `hash`
+        self.turn = WHITE
+        self.castling_rights = ALL_CASTLING_RIGHTS
+        self.en_passant = None
+        # The en passant key folded into `hash`, see `_en_passant_key`
+        self._en_passant_hash = 0
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+        self.hash = zobrist.CASTLING[self.castling_rights]
+        self.cache.clear()
+
+        # Undo records pushed by `make_move` and popped by `unmake_move`
+        self.history = []
+
+    def _put(self, piece, file, rank):
+        """Place a piece on a square, keeping the position hash in sync."""
+        self.state[file][rank] = piece
+        piece.file = file
+        piece.rank = rank
+        self.hash ^= zobrist.piece_key(piece, file, rank)
+
+    def _take(self, piece):
+        """Lift a piece off its square, keeping the position hash in sync."""
+        self.state[piece.file][piece.rank] = None
+        self.hash ^= zobrist.piece_key(piece, piece.file, piece.rank)
+
+    def _set_turn(self, color):
+        if color != self.turn:
+            self.hash ^= zobrist.BLACK_TO_MOVE
+            self.turn = color
+
+    def _set_castling_rights(self, rights):
+        self.hash ^= zobrist.CASTLING[self.castling_rights]
+        self.hash ^= zobrist.CASTLING[rights]
+        self.castling_rights = rights
+
+    def _symbol_at(self, file, rank):
+        return str(self.state[file][rank] or EMPTY)
+
+    def _set_en_passant(self, square):
+        """Set the en passant square. It only counts towards the hash when
+        a pawn can capture en passant.
+        """
+        self.hash ^= self._en_passant_hash
+        self._en_passant_hash = _en_passant_key(square, self._symbol_at)
+        self.hash ^= self._en_passant_hash
+        self.en_passant = square
+
+    def _update_move_state(self, piece, file, rank, new_file, new_rank,
+                           captured=False):
+        """Update side to move, castling rights, en passant square and the
+        move counters after `piece` has moved. Each update is O(1).
+        """
+        revoked = (CASTLING_RIGHTS_REVOKED.get((file, rank), 0) |
+                   CASTLING_RIGHTS_REVOKED.get((new_file, new_rank), 0))
+        if self.castling_rights & revoked:
+            self._set_castling_rights(self.castling_rights & ~revoked)
+
+        en_passant = None
+        if piece.__class__ == Pawn and abs(new_rank - rank) == 2:
+            en_passant = (file, (rank + new_rank) // 2)
+        self._set_en_passant(en_passant)
+
+        if captured or piece.__class__ == Pawn:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+
+        if piece.color == BLACK:
+            self.fullmove_number += 1
+
+        self._set_turn(BLACK if piece.color == WHITE else WHITE)
+
     def set_piece(self, piece_class, color, file, rank):
         if not self._is_valid_square(file, rank):
             raise MoveNotAllowed
 
+        other_piece = self[file][rank]
+        if other_piece:
+            self._take(other_piece)
+
         piece = piece_class(self, color, file, rank)
-        self[file][rank] = piece
+        self._put(piece, file, rank)
         return piece
 
     def remove_piece(self, file, rank):
@@ -68,34 +278,40 @@ class Board(object):
         piece.remove()
 
     def setup_pieces(self):
-        for rank in RANKS:
-            self.set_piece(Pawn, WHITE, 'b', rank)
-            self.set_piece(Pawn, BLACK, 'g', rank)
-
-        for file, color in (('a', WHITE), ('h', BLACK)):
-            self.set_piece(Rook, color, file, 1)
-            self.set_piece(Rook, color, file, 8)
-            self.set_piece(Knight, color, file, 2)
-            self.set_piece(Knight, color, file, 7)
-            self.set_piece(Bishop, color, file, 3)
-            self.set_piece(Bishop, color, file, 6)
-            self.set_piece(Queen, color, file, 4)
-            self.set_piece(King, color, file, 5)
+        for file in FILES:
+            self.set_piece(Pawn, WHITE, file, 2)
+            self.set_piece(Pawn, BLACK, file, 7)
+
+        for rank, color in ((1, WHITE), (8, BLACK)):
+            self.set_piece(Rook, color, 'a', rank)
+            self.set_piece(Rook, color, 'h', rank)
+            self.set_piece(Knight, color, 'b', rank)
+            self.set_piece(Knight, color, 'g', rank)
+            self.set_piece(Bishop, color, 'c', rank)
+            self.set_piece(Bishop, color, 'f', rank)
+            self.set_piece(Queen, color, 'd', rank)
+            self.set_piece(King, color, 'e', rank)
 
     def _is_valid_square(self, file, rank):
         return file in FILES and rank in RANKS
 
-    def _promote_pawn(self, piece):
-        file = piece.file
-        rank = piece.rank
-        color = piece.color
+    def _is_promotion(self, piece, new_rank):
+        return (piece.__class__ == Pawn and
+                new_rank == Pawn.PROMOTION_RANK[piece.color])
 
-        piece.remove()
+    def _promote_pawn(self, piece, promotion):
+        # The pawn object becomes the new piece, so promoting (and taking
+        # the promotion back in `unmake_move`) doesn't allocate
+        self._take(piece)
+        piece.__class__ = promotion
+        self._put(piece, piece.file, piece.rank)
 
-        # FIXME: for now just auto-promoting to queen
-        self.set_piece(Queen, color, file, rank)
+    def move_piece(self, file, rank, new_file, new_rank, promotion=None):
+        """Move the piece on (file, rank) to (new_file, new_rank).
 
-    def move_piece(self, file, rank, new_file, new_rank):
+        `promotion` is the piece class a pawn reaching the last rank is
+        promoted to, one of `PROMOTION_PIECES`; it defaults to `Queen`.
+        """
         if not self._is_valid_square(file, rank):
             raise MoveNotAllowed
 
@@ -103,14 +319,85 @@ class Board(object):
         if not piece:
             raise NoPieceThere
 
+        is_promotion = self._is_promotion(piece, new_rank)
+        if promotion is None:
+            promotion = Queen
+        elif not is_promotion or promotion not in PROMOTION_PIECES:
+            raise MoveNotAllowed
+
+        captured = self[new_file][new_rank] is not None
         piece.move(new_file, new_rank)
+        self._update_move_state(piece, file, rank, new_file, new_rank,
+                                captured=captured)
+
+        if is_promotion:
+            self._promote_pawn(piece, promotion)
+
+    def _squares_changed_by_move(self, piece, file, rank, new_file, new_rank):
+        squares = [(file, rank), (new_file, new_rank)]
+
+        if (piece.__class__ == Pawn and new_file != file and
+                not self[new_file][new_rank]):
+            # En passant removes the pawn beside us
+            squares.append((new_file, rank))
+        elif piece.__class__ == King and abs(FILES.index(new_file) -
+                                              FILES.index(file)) == 2:
+            # Castling also moves the rook
+            for rook_file in (('h', 'f') if new_file == 'g' else ('a', 'd')):
+                squares.append((rook_file, rank))
+
+        return squares
+
+    def make_move(self, file, rank, new_file, new_rank, promotion=None):
+        """Same as `move_piece`, but records what the move changed so that
+        it can be taken back with `unmake_move`. Making the move costs as
+        much as `move_piece`, since it is checked for legality, but the
+        record is O(1) to take and `unmake_move` is O(1).
+        """
+        if not self._is_valid_square(file, rank):
+            raise MoveNotAllowed
+
+        piece = self[file][rank]
+        if not piece:
+            raise NoPieceThere
+
+        squares = self._squares_changed_by_move(
+                piece, file, rank, new_file, new_rank)
+        move = (file, rank, new_file, new_rank)
+        if promotion is not None:
+            move += (promotion,)
+        record = (move,
+                  [(square, self[square[0]][square[1]]) for square in squares],
+                  piece.__class__, piece.moved,
+                  self.turn, self.castling_rights, self.en_passant,
+                  self.halfmove_clock, self.fullmove_number, self.hash,
+                  self._en_passant_hash,
+                  len(self.captured_pieces[piece.color]))
+
+        self.move_piece(file, rank, new_file, new_rank, promotion)
+        self.history.append(record)
+
+    def unmake_move(self):
+        """Take back the last move made with `make_move` and return it."""
+        (move, contents, piece_class, moved, self.turn, self.castling_rights,
+         self.en_passant, self.halfmove_clock, self.fullmove_number,
+         self.hash, self._en_passant_hash, num_captured) = self.history.pop()
+
+        for (file, rank), piece in contents:
+            self.state[file][rank] = piece
+            if piece:
+                piece.board = self
+                piece.file = file
+                piece.rank = rank
+
+        piece = self.state[move[0]][move[1]]
+        piece.__class__ = piece_class
+        piece.moved = moved
+        del self.captured_pieces[piece.color][num_captured:]
 
-        if piece.__class__ == Pawn:
-            if piece.color == WHITE and piece.rank == 8:
-                self._promote_pawn(piece)
-            elif piece.color == BLACK and piece.rank == 1:
-                self._promote_pawn(piece)
+        return move
 
+    @cached_by_args
     def occupied_squares(self, color):
         """Return all squares occupied by a given color"""
         squares = set()
@@ -118,6 +405,14 @@ class Board(object):
             squares.add((piece.file, piece.rank))
         return squares
 
+    @cached_by_args
+    def king_safety(self, color):
+        """Return the checks and pins against `color`'s king as a
+        `checks.KingSafety`, computed once per position.
+        """
+        return checks.analyze(self, color)
+
+    @cached_by_args
     def attacked_squares(self, color):
         """Return all attacked squares for a given color"""
         squares = set()
@@ -125,3 +420,110 @@ class Board(object):
             squares |= piece.get_squares_this_piece_attacks()
 
         return squares
+
+    def _attacked_by(self, piece):
+        """Yield the squares `piece` attacks, the same squares as
+        `get_squares_this_piece_attacks`, straight from the precomputed
+        tables.
+        """
+        square = (piece.file, piece.rank)
+        piece_class = piece.__class__
+        if piece_class == Knight:
+            for sq in tables.knight_jumps()[square]:
+                yield sq
+            return
+        if piece_class == King:
+            for sq in tables.king_steps()[square]:
+                yield sq
+            return
+
+        rays = tables.rays()[square]
+        if piece_class == Pawn:
+            rank_delta = 1 if piece.color == WHITE else -1
+            for file_delta in (1, -1):
+                ray = rays[(file_delta, rank_delta)]
+                if ray:
+                    yield ray[0]
+            return
+
+        state = self.state
+        for direction in SLIDER_DIRECTIONS[piece_class]:
+            for sq in rays[direction]:
+                yield sq
+                if state[sq[0]][sq[1]]:
+                    break
+
+    def attack_mask(self, piece):
+        """Return the squares `piece` attacks as a bitmask, see
+        `tables.SQUARE_BITS`.
+        """
+        mask = 0
+        for square in self._attacked_by(piece):
+            mask |= SQUARE_BITS[square]
+        return mask
+
+    def mobility(self, piece):
+        """Return the number of squares `piece` attacks that aren't
+        occupied by its own pieces. Pawn pushes aren't counted.
+        """
+        state = self.state
+        color = piece.color
+        count = 0
+        for file, rank in self._attacked_by(piece):
+            other_piece = state[file][rank]
+            if not other_piece or other_piece.color != color:
+                count += 1
+        return count
+
+    def attackers_of(self, square, color):
+        """Return a bitmask of the squares of `color`'s pieces that attack
+        `square`. `tables.popcount` gives the number of attackers.
+        """
+        state = self.state
+        mask = 0
+        for sq in tables.knight_jumps()[square]:
+            piece = state[sq[0]][sq[1]]
+            if piece and piece.color == color and piece.__class__ == Knight:
+                mask |= SQUARE_BITS[sq]
+
+        # A pawn attacks diagonally forward, so look diagonally backward for it
+        pawn_rank_delta = -1 if color == WHITE else 1
+
+        rays = tables.rays()[square]
+        for direction in DIRECTIONS:
+            ray = rays[direction]
+            for sq in ray:
+                piece = state[sq[0]][sq[1]]
+                if piece:
+                    break
+            else:
+                continue
+            if piece.color != color:
+                continue
+
+            piece_class = piece.__class__
+            if (piece_class in DIRECTION_SLIDERS[direction] or
+                    sq == ray[0] and (
+                        piece_class == King or
+                        piece_class == Pawn and direction[0] and
+                        direction[1] == pawn_rank_delta)):
+                mask |= SQUARE_BITS[sq]
+
+        return mask
+
+
+class _UnmaterializedBoard(Board):
+    """A copy-on-write clone whose pieces haven't been created yet.
+
+    Defining `__getattr__` slows down every attribute lookup, so only clones
+    have it: the first access to `state` creates the pieces and turns the
+    clone back into a regular board.
+    """
+    def __getattr__(self, name):
+        if name == 'state':
+            return self._materialize()
+        raise AttributeError(name)
+
+    def clear(self):
+        super(_UnmaterializedBoard, self).clear()
+        self.__class__ = self._board_class
@@ -0,0 +1,89 @@
+"""Per-position memoization of generated moves and attack sets.
+
+Entries are keyed on the board's position hash, so any change made through
+`move_piece`, `set_piece` or `remove_piece` (all of which update the hash)
+implicitly invalidates them, while transpositions back to an earlier position
+reuse its entries. The cache is a bounded LRU so long-lived boards don't grow
+without limit.
+"""
+import collections
+import functools
+
+
+DEFAULT_MAXSIZE = 4096
+
+
+class PositionCache(object):
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        # Created on first use: an OrderedDict is slow to create, and board
+        # copies each get a cache they may never use
+        self._entries = None
+
+    def __len__(self):
+        return len(self._entries) if self._entries is not None else 0
+
+    def clear(self):
+        if self._entries is not None:
+            self._entries.clear()
+
+    def get(self, position_hash, key, compute):
+        """Return the value cached for `key` in the given position, calling
+        `compute` to fill it in on a miss.
+        """
+        if not self.maxsize:
+            return compute()
+
+        cache_key = (position_hash, key)
+        entries = self._entries
+        if entries is None:
+            entries = self._entries = collections.OrderedDict()
+        try:
+            value = entries.pop(cache_key)
+        except KeyError:
+            self.misses += 1
+            value = compute()
+            if len(entries) >= self.maxsize:
+                entries.popitem(last=False)
+        else:
+            self.hits += 1
+
+        # Re-insert so the entry becomes the most recently used
+        entries[cache_key] = value
+        return value
+
+
+def _freeze(value):
+    return frozenset(value) if isinstance(value, set) else value
+
+
+def cached_by_square(func):
+    """Cache a piece method's result per position. The piece is identified by
+    its square, which together with the position hash determines the result.
+    Cached results are frozen so callers can't corrupt the cache.
+    """
+    @functools.wraps(func)
+    def wrapper(self):
+        board = self.board
+        cache = board.cache
+        if not cache.maxsize:
+            return func(self)
+        return cache.get(board.hash, (func, self.file, self.rank),
+                         lambda: frozenset(func(self)))
+    return wrapper
+
+
+def cached_by_args(func):
+    """Cache a board method's result per position, keyed on its arguments.
+    Sets are frozen; other results must not be mutated by callers.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args):
+        cache = self.cache
+        if not cache.maxsize:
+            return func(self, *args)
+        return cache.get(self.hash, (func,) + args,
+                         lambda: _freeze(func(self, *args)))
+    return wrapper
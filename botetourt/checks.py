@@ -0,0 +1,157 @@
+"""Check and pin detection.
+
+`analyze` works out everything move generation needs to know about the safety
+of one side's king in a single pass outward from it: the pieces giving check,
+the squares that capture or block a single checker, and the pinned pieces
+together with the squares they may still move to.
+"""
+from botetourt import tables
+from botetourt.consts import WHITE, FILES, RANKS
+from botetourt.tables import ORTHOGONAL, DIAGONAL
+
+
+# Symbols of the pieces that slide along each direction. Pieces are matched
+# by symbol since `pieces` itself depends on this module.
+SLIDERS = {}
+for _direction in ORTHOGONAL:
+    SLIDERS[_direction] = ('R', 'Q')
+for _direction in DIAGONAL:
+    SLIDERS[_direction] = ('B', 'Q')
+
+
+def square_at(file_idx, rank_idx):
+    """Return the square at the given indexes, or None if off the board."""
+    if 0 <= file_idx < len(FILES) and 0 <= rank_idx < len(RANKS):
+        return FILES[file_idx], RANKS[rank_idx]
+    return None
+
+
+def ray(square, direction):
+    """Return the squares moving away from `square` in `direction`."""
+    return tables.rays()[square][direction]
+
+
+class KingSafety(object):
+    """Checks and pins against one side's king.
+
+    `checkers` are the squares of the pieces giving check. With a single
+    checker, `check_ray` holds the squares that capture or block it.
+    `xray_squares` are the squares behind the king on a slider's line of
+    attack, which the king can't step back onto. `pins` maps each pinned
+    piece's square to the squares it may move to without exposing the king.
+    """
+    def __init__(self, king=None, checkers=(), check_ray=frozenset(),
+                 xray_squares=frozenset(), pins=None):
+        self.king = king
+        self.checkers = tuple(checkers)
+        self.check_ray = check_ray
+        self.xray_squares = xray_squares
+        self.pins = pins or {}
+
+    @property
+    def in_check(self):
+        return bool(self.checkers)
+
+    def restrict(self, piece, squares):
+        """Return the subset of `squares` a non-king `piece` may move to."""
+        if len(self.checkers) > 1:
+            # Only the king can answer a double check
+            return frozenset()
+
+        allowed = self.pins.get((piece.file, piece.rank))
+        if allowed is not None:
+            squares = squares & allowed
+        if self.checkers:
+            squares = squares & self.check_ray
+        return squares
+
+
+def analyze(board, color):
+    """Return the `KingSafety` for `color`'s king on `board`."""
+    king = None
+    for piece in board.get_pieces_by_color(color):
+        if piece.SYMBOL == 'K':
+            king = piece
+            break
+    if king is None:
+        return KingSafety()
+
+    king_square = (king.file, king.rank)
+    file_idx = FILES.index(king.file)
+    rank_idx = RANKS.index(king.rank)
+
+    checkers = []
+    check_ray = set()
+    xray_squares = set()
+    pins = {}
+
+    for sq in tables.knight_jumps()[king_square]:
+        piece = board[sq[0]][sq[1]]
+        if piece and piece.color != color and piece.SYMBOL == 'N':
+            checkers.append(sq)
+            check_ray.add(sq)
+
+    # Enemy pawns attack diagonally towards us
+    pawn_rank_delta = 1 if color == WHITE else -1
+
+    rays = tables.rays()[king_square]
+    for direction in ORTHOGONAL + DIAGONAL:
+        sliders = SLIDERS[direction]
+        path = []
+        own_piece = None
+        for distance, sq in enumerate(rays[direction], 1):
+            path.append(sq)
+            piece = board[sq[0]][sq[1]]
+            if not piece:
+                continue
+
+            if piece.color == color:
+                if own_piece is not None:
+                    # Two of our pieces in a row, so neither is pinned
+                    break
+                own_piece = piece
+                continue
+
+            if own_piece is None:
+                if piece.SYMBOL in sliders:
+                    checkers.append(sq)
+                    check_ray.update(path)
+                    behind = square_at(file_idx - direction[0],
+                                       rank_idx - direction[1])
+                    if behind:
+                        xray_squares.add(behind)
+                elif (distance == 1 and piece.SYMBOL == 'P' and
+                        direction in DIAGONAL and
+                        direction[1] == pawn_rank_delta):
+                    checkers.append(sq)
+                    check_ray.add(sq)
+            elif piece.SYMBOL in sliders:
+                pins[(own_piece.file, own_piece.rank)] = frozenset(path)
+            break
+
+    return KingSafety(king=king_square, checkers=checkers,
+                      check_ray=frozenset(check_ray),
+                      xray_squares=frozenset(xray_squares), pins=pins)
+
+
+def exposed_to_slider(board, color, king_square, vacated=(), occupied=()):
+    """Whether a slider would attack `color`'s king on `king_square` if the
+    squares in `vacated` were emptied and those in `occupied` filled.
+
+    Used for en passant, which empties two squares at once, so pin detection
+    alone doesn't catch it exposing the king.
+    """
+    rays = tables.rays()[king_square]
+    for direction in ORTHOGONAL + DIAGONAL:
+        for sq in rays[direction]:
+            if sq in occupied:
+                break
+            if sq in vacated:
+                continue
+            piece = board[sq[0]][sq[1]]
+            if piece:
+                if (piece.color != color and
+                        piece.SYMBOL in SLIDERS[direction]):
+                    return True
+                break
+    return False
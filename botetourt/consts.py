@@ -3,3 +3,11 @@ BLACK = 'Black'
 FILES = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h']
 RANKS = [1, 2, 3, 4, 5, 6, 7, 8]
 INFINITY = 9
+
+# Castling rights are stored on the board as a bitmask
+WHITE_KING_SIDE = 1
+WHITE_QUEEN_SIDE = 2
+BLACK_KING_SIDE = 4
+BLACK_QUEEN_SIDE = 8
+ALL_CASTLING_RIGHTS = (WHITE_KING_SIDE | WHITE_QUEEN_SIDE |
+                       BLACK_KING_SIDE | BLACK_QUEEN_SIDE)
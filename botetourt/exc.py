@@ -8,3 +8,23 @@ class NoPieceThere(ChessException):
 
 class MoveNotAllowed(ChessException):
     pass
+
+
+class InvalidFEN(ChessException):
+    pass
+
+
+class InvalidPGN(ChessException):
+    pass
+
+
+class SearchStopped(ChessException):
+    pass
+
+
+class ServiceBusy(ChessException):
+    pass
+
+
+class AnalysisFailed(ChessException):
+    pass
@@ -0,0 +1,123 @@
+"""Forsyth-Edwards Notation (FEN) reading and writing."""
+from botetourt.board import Board
+from botetourt.consts import (WHITE, BLACK, FILES, RANKS, WHITE_KING_SIDE,
+                              WHITE_QUEEN_SIDE, BLACK_KING_SIDE,
+                              BLACK_QUEEN_SIDE)
+from botetourt.exc import InvalidFEN
+from botetourt.pieces import PIECES_BY_SYMBOL
+
+
+STARTING_POSITION = \
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+CASTLING_SYMBOLS = [('K', WHITE_KING_SIDE), ('Q', WHITE_QUEEN_SIDE),
+                    ('k', BLACK_KING_SIDE), ('q', BLACK_QUEEN_SIDE)]
+
+
+def _parse_square(square):
+    if len(square) != 2 or square[0] not in FILES or not square[1].isdigit():
+        raise InvalidFEN('invalid square %r' % square)
+    rank = int(square[1])
+    if rank not in RANKS:
+        raise InvalidFEN('invalid square %r' % square)
+    return square[0], rank
+
+
+def load(board, fen):
+    """Clear `board` and set it up from a FEN string."""
+    fields = fen.split()
+    if len(fields) == 4:
+        # The move counters are optional in the wild
+        fields += ['0', '1']
+    if len(fields) != 6:
+        raise InvalidFEN('expected 6 fields, got %d' % len(fields))
+
+    placement, turn, castling, en_passant, halfmove, fullmove = fields
+
+    board.clear()
+
+    rows = placement.split('/')
+    if len(rows) != len(RANKS):
+        raise InvalidFEN('expected %d ranks, got %d' % (len(RANKS), len(rows)))
+
+    for rank, row in zip(reversed(RANKS), rows):
+        file_idx = 0
+        for char in row:
+            if char.isdigit():
+                file_idx += int(char)
+                continue
+
+            piece_class = PIECES_BY_SYMBOL.get(char.upper())
+            if piece_class is None or file_idx >= len(FILES):
+                raise InvalidFEN('invalid rank %r' % row)
+
+            color = WHITE if char.isupper() else BLACK
+            board.set_piece(piece_class, color, FILES[file_idx], rank)
+            file_idx += 1
+
+        if file_idx != len(FILES):
+            raise InvalidFEN('invalid rank %r' % row)
+
+    if turn not in ('w', 'b'):
+        raise InvalidFEN('invalid side to move %r' % turn)
+    board._set_turn(WHITE if turn == 'w' else BLACK)
+
+    rights = 0
+    if castling != '-':
+        for char in castling:
+            bits = dict(CASTLING_SYMBOLS).get(char)
+            if bits is None:
+                raise InvalidFEN('invalid castling rights %r' % castling)
+            rights |= bits
+    board._set_castling_rights(rights)
+
+    if en_passant != '-':
+        board._set_en_passant(_parse_square(en_passant))
+
+    try:
+        board.halfmove_clock = int(halfmove)
+        board.fullmove_number = int(fullmove)
+    except ValueError:
+        raise InvalidFEN('invalid move counters %r %r' % (halfmove, fullmove))
+
+    return board
+
+
+def loads(fen):
+    """Return a new `Board` set up from a FEN string."""
+    return load(Board(), fen)
+
+
+def dumps(board):
+    """Return the FEN string describing `board`."""
+    rows = []
+    for rank in reversed(RANKS):
+        row = []
+        empty = 0
+        for file in FILES:
+            piece = board[file][rank]
+            if piece:
+                if empty:
+                    row.append(str(empty))
+                    empty = 0
+                row.append(str(piece))
+            else:
+                empty += 1
+        if empty:
+            row.append(str(empty))
+        rows.append(''.join(row))
+
+    castling = ''.join(symbol for symbol, bits in CASTLING_SYMBOLS
+                       if board.castling_rights & bits)
+
+    if board.en_passant:
+        en_passant = '%s%d' % board.en_passant
+    else:
+        en_passant = '-'
+
+    return ' '.join(['/'.join(rows),
+                     'w' if board.turn == WHITE else 'b',
+                     castling or '-',
+                     en_passant,
+                     str(board.halfmove_clock),
+                     str(board.fullmove_number)])
@@ -0,0 +1,304 @@
+"""Compact binary storage for game collections.
+
+Each move is stored relative to the position it is played from, as a pair of
+small indexes: the moving piece's index among the side to move's pieces (in
+board order, file by file), and the move's index among that piece's legal
+moves (sorted by target square, promotions in `PROMOTION_PIECES` order).
+Decoding a move therefore only generates the legal moves of the one piece
+that moves.
+
+The indexes are stored with one of two coders:
+
+`RAW`
+    two bytes per move.
+`PACKED` (the default)
+    the indexes of the whole game as a single mixed-radix number, using the
+    number of pieces and the piece's number of legal moves as the radix of
+    each digit. A move takes log2(pieces * moves) bits, typically under one
+    byte.
+
+A file is `MAGIC` followed by length-prefixed game records:
+
+    varint      header count, then each name and value as varint length
+                and bytes
+    byte        result, an index into `pgn.RESULTS`
+    byte        coder
+    varint      number of moves
+    bytes       encoded moves
+
+Games that don't start from the standard position keep their starting
+position in the FEN header, as in PGN.
+"""
+from botetourt import fen, pgn
+from botetourt.exc import ChessException, MoveNotAllowed
+from botetourt.pieces import Pawn, Queen, PROMOTION_PIECES
+from botetourt.writer import BufferedWriter
+
+
+MAGIC = 'BTGAME01'
+
+RAW = 0
+PACKED = 1
+
+
+def _write_varint(chunks, value):
+    while value >= 0x80:
+        chunks.append(chr(value & 0x7f | 0x80))
+        value >>= 7
+    chunks.append(chr(value))
+
+
+def _read_varint(data, pos):
+    """Return (value, position after it) for the varint at `data[pos]`."""
+    value = shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError('truncated game record')
+        byte = ord(data[pos])
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _read_string(data, pos):
+    length, pos = _read_varint(data, pos)
+    if pos + length > len(data):
+        raise ValueError('truncated game record')
+    return data[pos:pos + length], pos + length
+
+
+def _piece_moves(piece):
+    """The legal moves of `piece` in their encoding order."""
+    moves = []
+    for new_file, new_rank in sorted(piece.get_legal_moves()):
+        move = (piece.file, piece.rank, new_file, new_rank)
+        if (piece.__class__ == Pawn and
+                new_rank == Pawn.PROMOTION_RANK[piece.color]):
+            moves.extend(move + (promotion,) for promotion in PROMOTION_PIECES)
+        else:
+            moves.append(move)
+    return moves
+
+
+def encode_move(board, move):
+    """Return (piece index, number of pieces, move index, number of moves)
+    for `move` on `board`.
+    """
+    file, rank, new_file, new_rank = move[:4]
+    pieces = list(board.get_pieces_by_color(board.turn))
+    piece = board[file][rank]
+    if piece is None or piece.color != board.turn:
+        raise MoveNotAllowed('no piece to move on %s%d' % (file, rank))
+
+    moves = _piece_moves(piece)
+    if (len(move) == 4 and piece.__class__ == Pawn and
+            new_rank == Pawn.PROMOTION_RANK[piece.color]):
+        move += (Queen,)
+    try:
+        move_index = moves.index(move)
+    except ValueError:
+        raise MoveNotAllowed('illegal move %s%d%s%d' % move[:4])
+
+    return pieces.index(piece), len(pieces), move_index, len(moves)
+
+
+def _digit(index, radix):
+    if not 0 <= index < radix:
+        raise ValueError('corrupt game record')
+    return index
+
+
+def decode_move(board, piece_index, move_index):
+    """Return the move encoded by the two indexes. Raises `ValueError` if
+    they don't encode a legal move on `board`.
+    """
+    pieces = list(board.get_pieces_by_color(board.turn))
+    moves = _piece_moves(pieces[_digit(piece_index, len(pieces))])
+    return moves[_digit(move_index, len(moves))]
+
+
+def _encode_number(number):
+    if not number:
+        return ''
+    digits = '%x' % number
+    return ('0' + digits if len(digits) % 2 else digits).decode('hex')
+
+
+class StoredGame(object):
+    """A game read from a game file. Its moves stay encoded until they are
+    replayed.
+    """
+    def __init__(self, headers, result, coder, num_moves, payload, offset=0):
+        self.headers = headers
+        self.result = result
+        self.coder = coder
+        self.num_moves = num_moves
+        self.payload = payload
+        # Byte offset of the record within its file
+        self.offset = offset
+
+    @property
+    def starting_fen(self):
+        return self.headers.get('FEN', fen.STARTING_POSITION)
+
+    def new_board(self):
+        return fen.loads(self.starting_fen)
+
+    def _raw_indexes(self):
+        payload = self.payload
+        if len(payload) != 2 * self.num_moves:
+            raise ValueError('corrupt game record')
+        for i in xrange(0, len(payload), 2):
+            yield ord(payload[i]), ord(payload[i + 1])
+
+    def replay(self, board=None):
+        """Play the game on `board` (by default from its starting
+        position), yielding each move after it is made. Raises `ValueError`
+        if the record is corrupt.
+        """
+        if board is None:
+            board = self.new_board()
+
+        if self.coder == RAW:
+            for piece_index, move_index in self._raw_indexes():
+                move = decode_move(board, piece_index, move_index)
+                board.move_piece(*move)
+                yield move
+            return
+
+        number = int(self.payload.encode('hex') or '0', 16)
+        for _ in xrange(self.num_moves):
+            pieces = list(board.get_pieces_by_color(board.turn))
+            if not pieces:
+                raise ValueError('corrupt game record')
+            number, piece_index = divmod(number, len(pieces))
+            # The moving piece always has a legal move when encoding
+            moves = _piece_moves(pieces[piece_index])
+            if not moves:
+                raise ValueError('corrupt game record')
+            number, move_index = divmod(number, len(moves))
+            move = moves[move_index]
+            board.move_piece(*move)
+            yield move
+        if number:
+            raise ValueError('corrupt game record')
+
+
+class GameFileWriter(BufferedWriter):
+    """Writes games to a game file, see the module docstring."""
+    def __init__(self, fileobj, coder=PACKED, **kwargs):
+        super(GameFileWriter, self).__init__(fileobj, **kwargs)
+        self.coder = coder
+        self.write(MAGIC)
+
+    def write_game(self, board, moves, headers=None, result='*'):
+        """Encode a game played from `board`'s position, making each move on
+        `board`. If a move is illegal (or `moves` raises), nothing is
+        written, `board` is put back in its starting position and the
+        error is raised.
+        """
+        headers = dict(headers or ())
+        position = fen.dumps(board)
+        if position != fen.STARTING_POSITION:
+            headers['FEN'] = position
+
+        digits = []
+        try:
+            for move in moves:
+                piece_index, num_pieces, move_index, num_moves = encode_move(
+                    board, move)
+                digits.append((piece_index, num_pieces))
+                digits.append((move_index, num_moves))
+                board.make_move(*move)
+        except Exception:
+            for _ in xrange(len(digits) // 2):
+                board.unmake_move()
+            raise
+
+        if self.coder == RAW:
+            payload = ''.join(chr(digit) for digit, _ in digits)
+        else:
+            number = 0
+            for digit, radix in reversed(digits):
+                number = number * radix + digit
+            payload = _encode_number(number)
+
+        record = []
+        _write_varint(record, len(headers))
+        for name, value in sorted(headers.items()):
+            for text in (name, value):
+                _write_varint(record, len(text))
+                record.append(text)
+        record.append(chr(pgn.RESULTS.index(result)))
+        record.append(chr(self.coder))
+        _write_varint(record, len(digits) // 2)
+        record.append(payload)
+
+        record = ''.join(record)
+        length = []
+        _write_varint(length, len(record))
+        self.write(''.join(length) + record)
+
+
+def read_games(fileobj):
+    """Yield each `StoredGame` in a game file, one at a time."""
+    if fileobj.read(len(MAGIC)) != MAGIC:
+        raise ValueError('not a game file')
+    offset = len(MAGIC)
+
+    while True:
+        prefix = fileobj.read(1)
+        if not prefix:
+            return
+        # Record lengths are varints, so keep reading while the high bit
+        # is set
+        while ord(prefix[-1]) & 0x80:
+            byte = fileobj.read(1)
+            if not byte:
+                raise ValueError('truncated game record')
+            prefix += byte
+        length, _ = _read_varint(prefix, 0)
+        data = fileobj.read(length)
+        if len(data) != length:
+            raise ValueError('truncated game record')
+
+        num_headers, pos = _read_varint(data, 0)
+        headers = {}
+        for _ in xrange(num_headers):
+            name, pos = _read_string(data, pos)
+            headers[name], pos = _read_string(data, pos)
+        if pos + 2 > len(data):
+            raise ValueError('truncated game record')
+        result = pgn.RESULTS[ord(data[pos])]
+        coder = ord(data[pos + 1])
+        num_moves, pos = _read_varint(data, pos + 2)
+
+        yield StoredGame(headers, result, coder, num_moves, data[pos:],
+                         offset=offset)
+        offset += len(prefix) + length
+
+
+def convert(pgn_fileobj, fileobj, coder=PACKED):
+    """Convert every game in a PGN file. Returns (games written, games that
+    could not be replayed).
+    """
+    def moves(board, game):
+        # Resolved lazily, so each SAN move is read in the position the
+        # writer has reached
+        for san in game.moves:
+            yield pgn.san_to_move(board, san)
+
+    written = failed = 0
+    with GameFileWriter(fileobj, coder=coder) as writer:
+        for game in pgn.read_games(pgn_fileobj):
+            board = game.new_board()
+            try:
+                writer.write_game(board, moves(board, game), game.headers,
+                                  game.result)
+            except ChessException:
+                failed += 1
+            else:
+                written += 1
+    return written, failed
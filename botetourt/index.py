@@ -0,0 +1,167 @@
+"""On-disk index from position hash to the games that reached the position.
+
+Building the index replays games through a `Board` and records a
+(position hash, game offset) pair for every position reached. Pairs are
+buffered in memory up to `run_size`, then sorted and spilled to a run file,
+so memory stays bounded however many games are indexed. `finish` merges the
+runs into a single sorted file, which `PositionIndex` memory-maps and binary
+searches.
+
+Records are big-endian so that comparing them as byte strings orders them
+numerically.
+"""
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+
+from botetourt import pgn
+from botetourt.exc import ChessException
+
+
+MAGIC = 'BTPIDX01'
+RECORD = struct.Struct('>QQ')
+HASH = struct.Struct('>Q')
+
+DEFAULT_RUN_SIZE = 1 << 18
+
+
+def _read_records(path):
+    with open(path, 'rb') as f:
+        while True:
+            record = f.read(RECORD.size)
+            if not record:
+                return
+            yield record
+
+
+class IndexBuilder(object):
+    def __init__(self, path, run_size=DEFAULT_RUN_SIZE):
+        self.path = path
+        self.run_size = run_size
+        self._buffer = []
+        self._runs = []
+        self._run_dir = os.path.dirname(os.path.abspath(path))
+
+    def add(self, position_hash, offset):
+        self._buffer.append(RECORD.pack(position_hash, offset))
+        if len(self._buffer) >= self.run_size:
+            self._spill()
+
+    def add_game(self, game):
+        """Replay `game` and index every position it reaches.
+
+        If a move can't be played the positions before it stay indexed and
+        the error is raised.
+        """
+        board = game.new_board()
+        seen = {board.hash}
+        self.add(board.hash, game.offset)
+        for _ in pgn.replay(board, game.moves):
+            if board.hash not in seen:
+                seen.add(board.hash)
+                self.add(board.hash, game.offset)
+
+    def _spill(self):
+        if not self._buffer:
+            return
+        self._buffer.sort()
+        fd, run_path = tempfile.mkstemp(prefix='run-', suffix='.tmp',
+                                        dir=self._run_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(''.join(self._buffer))
+        self._runs.append(run_path)
+        self._buffer = []
+
+    def finish(self):
+        """Merge the sorted runs into the index file, dropping duplicates."""
+        self._spill()
+        try:
+            with open(self.path, 'wb') as f:
+                f.write(MAGIC)
+                previous = None
+                merged = heapq.merge(*[_read_records(run)
+                                       for run in self._runs])
+                for record in merged:
+                    if record != previous:
+                        f.write(record)
+                        previous = record
+        finally:
+            for run in self._runs:
+                os.remove(run)
+            self._runs = []
+
+
+def build_index(fileobj, path, run_size=DEFAULT_RUN_SIZE):
+    """Index every game in a PGN file. Returns (games indexed, games that
+    could not be fully replayed).
+    """
+    builder = IndexBuilder(path, run_size=run_size)
+    indexed = failed = 0
+    for game in pgn.read_games(fileobj):
+        try:
+            builder.add_game(game)
+        except ChessException:
+            failed += 1
+        else:
+            indexed += 1
+    builder.finish()
+    return indexed, failed
+
+
+class PositionIndex(object):
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if self._file.read(len(MAGIC)) != MAGIC:
+            self._file.close()
+            raise ValueError('%s is not a position index' % path)
+
+        self._count = (size - len(MAGIC)) // RECORD.size
+        if self._count:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        else:
+            # mmap can't map an empty range
+            self._map = None
+
+    def __len__(self):
+        return self._count
+
+    def _hash_at(self, idx):
+        start = len(MAGIC) + idx * RECORD.size
+        return self._map[start:start + HASH.size]
+
+    def lookup(self, position_hash):
+        """Return the offsets of the games that reached the position."""
+        if not self._count:
+            return []
+
+        key = HASH.pack(position_hash)
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._hash_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        offsets = []
+        while lo < self._count and self._hash_at(lo) == key:
+            start = len(MAGIC) + lo * RECORD.size
+            offsets.append(RECORD.unpack(
+                self._map[start:start + RECORD.size])[1])
+            lo += 1
+        return offsets
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
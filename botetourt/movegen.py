@@ -0,0 +1,170 @@
+"""Staged move generation for search.
+
+Moves are (file, rank, new_file, new_rank) tuples for the side to move, with
+the piece class appended for promotions, e.g. ('e', 7, 'e', 8, Knight). Each
+promotion square gives one move per piece in `PROMOTION_PIECES`. Search
+usually cuts off after the first few moves, so `staged_moves` generates them
+lazily, one stage at a time:
+
+1. the hash move (e.g. the best move from a transposition table)
+2. captures, ordered by MVV-LVA (most valuable victim, least valuable
+   attacker)
+3. killer moves (quiet moves that caused a cutoff at the same ply)
+4. the remaining quiet moves
+
+A stage is only generated once the previous one has run out. Captures are
+found from the pieces' attack sets, so the quiet moves, which require pawn
+pushes and castling to be worked out, are never generated for nodes that cut
+off early.
+"""
+from botetourt.consts import WHITE, BLACK
+from botetourt.pieces import King, Pawn, PIECES_BY_SYMBOL, PROMOTION_PIECES
+
+
+HASH_MOVE = 'hash_move'
+CAPTURES = 'captures'
+KILLERS = 'killers'
+QUIETS = 'quiets'
+
+
+def _opposite_color(color):
+    return BLACK if color == WHITE else WHITE
+
+
+def format_move(move):
+    """Return `move` in coordinate notation, e.g. 'e2e4' or 'e7e8n'."""
+    text = '%s%d%s%d' % move[:4]
+    if len(move) > 4:
+        text += move[4].SYMBOL.lower()
+    return text
+
+
+def parse_move(text):
+    """Parse a move in coordinate notation, e.g. 'e2e4' or 'e7e8n'."""
+    move = text[0], int(text[1]), text[2], int(text[3])
+    if len(text) > 4:
+        move += (PIECES_BY_SYMBOL[text[4].upper()],)
+    return move
+
+
+def _is_promotion(piece, new_rank):
+    return (piece.__class__ == Pawn and
+            new_rank == Pawn.PROMOTION_RANK[piece.color])
+
+
+def _moves(piece, new_file, new_rank):
+    """The moves of `piece` to a square, one per promotion choice."""
+    move = (piece.file, piece.rank, new_file, new_rank)
+    if _is_promotion(piece, new_rank):
+        return [move + (promotion,) for promotion in PROMOTION_PIECES]
+    return [move]
+
+
+def is_legal(board, move):
+    """Whether `move` is a legal move for the side to move. Promotions must
+    name the piece promoted to, as generated moves do.
+    """
+    file, rank, new_file, new_rank = move[:4]
+    piece = board[file][rank]
+    if piece is None or piece.color != board.turn:
+        return False
+
+    if _is_promotion(piece, new_rank):
+        if len(move) != 5 or move[4] not in PROMOTION_PIECES:
+            return False
+    elif len(move) > 4:
+        return False
+
+    return (new_file, new_rank) in piece.get_legal_moves()
+
+
+def captured_piece(board, move):
+    """Return the piece `move` would capture, or None."""
+    file, rank, new_file, new_rank = move[:4]
+    piece = board[new_file][new_rank]
+    if piece:
+        return piece
+
+    if ((new_file, new_rank) == board.en_passant and
+            board[file][rank].__class__ == Pawn):
+        return board[new_file][rank]
+
+    return None
+
+
+def is_capture(board, move):
+    return captured_piece(board, move) is not None
+
+
+def _capture_squares(piece, enemy_squares):
+    """Squares `piece` can capture on, without generating its quiet moves."""
+    board = piece.board
+    safety = board.king_safety(piece.color)
+    squares = piece.get_squares_this_piece_attacks() & enemy_squares
+
+    if piece.__class__ == King:
+        if squares:
+            squares -= board.attacked_squares(piece.color)
+            squares -= safety.xray_squares
+        return squares
+
+    if piece.__class__ == Pawn and piece._can_capture_en_passant():
+        # Pawn.get_legal_moves knows when en passant answers a check
+        return piece.get_legal_moves() & (squares | {board.en_passant})
+
+    return safety.restrict(piece, squares)
+
+
+def generate_captures(board):
+    """Return the captures for the side to move ordered by MVV-LVA, with
+    capturing promotions to more valuable pieces first.
+    """
+    color = board.turn
+    enemy_squares = board.occupied_squares(_opposite_color(color))
+
+    scored = []
+    for piece in board.get_pieces_by_color(color):
+        for new_file, new_rank in _capture_squares(piece, enemy_squares):
+            for order, move in enumerate(_moves(piece, new_file, new_rank)):
+                victim = captured_piece(board, move)
+                scored.append((-victim.VALUE, piece.VALUE, order, move))
+
+    scored.sort()
+    return [move for _, _, _, move in scored]
+
+
+def generate_quiets(board):
+    """Return the non-capturing moves for the side to move."""
+    moves = []
+    for piece in board.get_pieces_by_color(board.turn):
+        for new_file, new_rank in piece.get_legal_moves():
+            move = (piece.file, piece.rank, new_file, new_rank)
+            if not is_capture(board, move):
+                moves.extend(_moves(piece, new_file, new_rank))
+    return moves
+
+
+def staged_moves(board, hash_move=None, killers=()):
+    """Yield (stage, move) for every legal move of the side to move, one
+    stage at a time. Each move is yielded exactly once.
+    """
+    yielded = set()
+
+    if hash_move is not None and is_legal(board, hash_move):
+        yielded.add(hash_move)
+        yield HASH_MOVE, hash_move
+
+    for move in generate_captures(board):
+        if move not in yielded:
+            yielded.add(move)
+            yield CAPTURES, move
+
+    for move in killers:
+        if (move not in yielded and is_legal(board, move) and
+                not is_capture(board, move)):
+            yielded.add(move)
+            yield KILLERS, move
+
+    for move in generate_quiets(board):
+        if move not in yielded:
+            yield QUIETS, move
@@ -0,0 +1,220 @@
+"""Portable Game Notation (PGN) reading and Standard Algebraic Notation (SAN)
+move resolution and formatting. See `botetourt.writer` for writing PGN.
+"""
+import re
+
+from botetourt import fen
+from botetourt.exc import InvalidPGN, MoveNotAllowed
+from botetourt.consts import FILES
+from botetourt.pieces import King, Pawn, Queen, PIECES_BY_SYMBOL
+
+
+SAN_RE = re.compile(r'^([NBRQK])?([a-h])?([1-8])?x?([a-h])([1-8])'
+                    r'(?:=?([NBRQ]))?[+#]?[!?]*$')
+CASTLING_RE = re.compile(r'^([O0]-[O0](?:-[O0])?)[+#]?[!?]*$')
+TAG_RE = re.compile(r'^\[(\w+)\s+"(.*)"\]\s*$')
+MOVE_NUMBER_RE = re.compile(r'^\d+\.+')
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+
+
+class Game(object):
+    def __init__(self, headers, moves, result, offset=0):
+        self.headers = headers
+        self.moves = moves
+        self.result = result
+        # Byte offset of the first line of the game within its source
+        self.offset = offset
+
+    @property
+    def starting_fen(self):
+        return self.headers.get('FEN', fen.STARTING_POSITION)
+
+    def new_board(self):
+        return fen.loads(self.starting_fen)
+
+
+def _strip_movetext(movetext):
+    """Remove comments, variations and NAGs from movetext."""
+    movetext = re.sub(r'\{[^}]*\}', ' ', movetext)
+    movetext = re.sub(r';[^\n]*', ' ', movetext)
+
+    # Variations nest, so strip innermost first
+    previous = None
+    while previous != movetext:
+        previous = movetext
+        movetext = re.sub(r'\([^()]*\)', ' ', movetext)
+
+    return re.sub(r'\$\d+', ' ', movetext)
+
+
+def parse_movetext(movetext):
+    """Return (SAN moves, result) for a game's movetext."""
+    moves = []
+    result = '*'
+    for token in _strip_movetext(movetext).split():
+        if token in RESULTS:
+            result = token
+            continue
+        token = MOVE_NUMBER_RE.sub('', token)
+        if token:
+            moves.append(token)
+    return moves, result
+
+
+def read_games(fileobj):
+    """Yield each `Game` in a PGN file, one at a time."""
+    headers = {}
+    movetext = []
+    offset = position = 0
+
+    def make_game():
+        moves, result = parse_movetext(' '.join(movetext))
+        return Game(headers, moves, result, offset=offset)
+
+    for line in fileobj:
+        line_length = len(line)
+        line = line.strip()
+
+        if line.startswith('['):
+            if movetext:
+                yield make_game()
+                headers = {}
+                movetext = []
+            if not headers:
+                offset = position
+            match = TAG_RE.match(line)
+            if not match:
+                raise InvalidPGN('invalid tag pair %r' % line)
+            headers[match.group(1)] = match.group(2)
+        elif line:
+            if not headers and not movetext:
+                offset = position
+            movetext.append(line)
+
+        position += line_length
+
+    if headers or movetext:
+        yield make_game()
+
+
+def parse_san(board, san):
+    """Resolve a SAN move for the side to move into
+    (file, rank, new_file, new_rank, promotion).
+
+    `promotion` is the SAN letter of the promoted-to piece, or None.
+    """
+    color = board.turn
+    match = CASTLING_RE.match(san)
+    if match:
+        rank = King.HOME_RANK[color]
+        new_file = 'c' if len(match.group(1)) == 5 else 'g'
+        return 'e', rank, new_file, rank, None
+
+    match = SAN_RE.match(san)
+    if not match:
+        raise InvalidPGN('invalid move %r' % san)
+
+    symbol, from_file, from_rank, new_file, new_rank, promotion = \
+        match.groups()
+    piece_class = PIECES_BY_SYMBOL[symbol] if symbol else Pawn
+    new_rank = int(new_rank)
+    if from_rank:
+        from_rank = int(from_rank)
+
+    candidates = []
+    for piece in board.get_pieces_by_color(color):
+        if piece.__class__ != piece_class:
+            continue
+        if from_file and piece.file != from_file:
+            continue
+        if from_rank and piece.rank != from_rank:
+            continue
+        if (new_file, new_rank) in piece.get_legal_moves():
+            candidates.append(piece)
+
+    if not candidates:
+        raise MoveNotAllowed('illegal move %r' % san)
+    if len(candidates) > 1:
+        raise InvalidPGN('ambiguous move %r' % san)
+
+    piece = candidates[0]
+    return piece.file, piece.rank, new_file, new_rank, promotion
+
+
+def san_to_move(board, san):
+    """Return a SAN move as (file, rank, new_file, new_rank), with the
+    promoted-to piece class appended for promotions.
+    """
+    file, rank, new_file, new_rank, promotion = parse_san(board, san)
+    move = (file, rank, new_file, new_rank)
+    if promotion:
+        move += (PIECES_BY_SYMBOL[promotion],)
+    return move
+
+
+def play(board, san):
+    """Make a SAN move on `board` and return it, see `san_to_move`."""
+    move = san_to_move(board, san)
+    board.move_piece(*move)
+    return move
+
+
+def _check_suffix(board):
+    """'#' or '+' if the side to move is mated or in check, else ''."""
+    if not board.king_safety(board.turn).in_check:
+        return ''
+    for piece in board.get_pieces_by_color(board.turn):
+        if piece.get_legal_moves():
+            return '+'
+    return '#'
+
+
+def san(board, move):
+    """Return the SAN for `move`, which must be legal for the side to move.
+
+    The move is made and taken back to work out check and mate.
+    """
+    file, rank, new_file, new_rank = move[:4]
+    piece = board[file][rank]
+    if piece is None:
+        raise MoveNotAllowed('no piece on %s%d' % (file, rank))
+
+    target = '%s%d' % (new_file, new_rank)
+    capture = (board[new_file][new_rank] is not None or
+               (piece.__class__ == Pawn and new_file != file))
+
+    if piece.__class__ == King and abs(FILES.index(new_file) -
+                                       FILES.index(file)) == 2:
+        text = 'O-O' if new_file == 'g' else 'O-O-O'
+    elif piece.__class__ == Pawn:
+        text = (file + 'x' if capture else '') + target
+        if new_rank == Pawn.PROMOTION_RANK[piece.color]:
+            promotion = move[4] if len(move) > 4 else Queen
+            text += '=' + promotion.SYMBOL
+    else:
+        rivals = [other for other in board.get_pieces_by_color(piece.color)
+                  if other is not piece and
+                  other.__class__ == piece.__class__ and
+                  (new_file, new_rank) in other.get_legal_moves()]
+        disambiguation = ''
+        if rivals:
+            if all(other.file != file for other in rivals):
+                disambiguation = file
+            elif all(other.rank != rank for other in rivals):
+                disambiguation = str(rank)
+            else:
+                disambiguation = '%s%d' % (file, rank)
+        text = (piece.SYMBOL + disambiguation + ('x' if capture else '') +
+                target)
+
+    board.make_move(*move)
+    try:
+        return text + _check_suffix(board)
+    finally:
+        board.unmake_move()
+
+
+def replay(board, moves):
+    """Play SAN `moves` on `board`, yielding each move after it is made."""
+    for san in moves:
+        yield play(board, san)
@@ -1,8 +1,15 @@
-from botetourt.consts import WHITE, BLACK, FILES, RANKS, INFINITY
-from botetourt.exc import MoveNotAllowed 
+from botetourt.consts import (WHITE, BLACK, FILES, RANKS, INFINITY,
+                              WHITE_KING_SIDE, WHITE_QUEEN_SIDE,
+                              BLACK_KING_SIDE, BLACK_QUEEN_SIDE)
+from botetourt import checks, tables
+from botetourt.cache import cached_by_square
+from botetourt.exc import MoveNotAllowed
 
 
 class Piece(object):
+    # Material value in centipawns, used for move ordering and evaluation
+    VALUE = 0
+
     def __init__(self, board, color, file, rank):
         self.board = board
         self.color = color
@@ -121,7 +128,7 @@ class Piece(object):
         pass
 
     def remove(self):
-        self.board[self.file][self.rank] = None
+        self.board._take(self)
         self.file = self.rank = self.board = None
 
     def move(self, new_file, new_rank):
@@ -131,14 +138,12 @@ class Piece(object):
         other_piece = self.board[new_file][new_rank]
         if other_piece and other_piece.color != self.color:
             self._capture(other_piece)
+            self.board._take(other_piece)
 
         self._pre_move_hook(new_file, new_rank)
 
-        self.board[self.file][self.rank] = None
-
-        self.board[new_file][new_rank] = self
-        self.file = new_file
-        self.rank = new_rank
+        self.board._take(self)
+        self.board._put(self, new_file, new_rank)
 
         self.moved = True
 
@@ -150,102 +155,113 @@ class Piece(object):
         directions = self.get_attack_vector_directions()
         return self._attack_vectors(directions)
 
+    @cached_by_square
     def get_squares_this_piece_attacks(self):
         """Return all squares attacked by this piece as a set."""
         vectors = self.get_attack_vectors()
         return {sq for v in vectors for sq in v}
 
-    def get_legal_moves(self):
+    def _get_pseudo_legal_moves(self):
+        """Moves that ignore whether our king is left in check."""
         attacks = self.get_squares_this_piece_attacks()
         occupied = self.board.occupied_squares(self.color)
         return attacks - occupied
 
-    def _get_vectors_attacking_this_piece(self, exclude_knights=False):
-        vectors = []
-        for piece in self.board.get_pieces_by_opposite_color(self.color):
-            if piece.__class__ == Knight and exclude_knights:
-                continue
-            vectors = piece.get_attack_vectors()
-            for vector in vectors:
-                if (self.file, self.rank) in vector:
-                    yield vector
-
-    def _can_interpose_upon_attack(self):
-        """Determine whether there is a piece of our color that can interpose
-        upon an attack on us.
-        """
-        legal_moves = set()
-        for piece in self.board.get_pieces_by_color(self.color):
-            legal_moves |= piece.get_legal_moves()
-
-        # Can't interpose between a knight and another piece (it jumps...)
-        for vector in self._get_vectors_attacking_this_piece(exclude_knights=True):
-            if set(vector) & legal_moves:
-                return True
-
-        return False
+    @cached_by_square
+    def get_legal_moves(self):
+        moves = self._get_pseudo_legal_moves()
+        return self.board.king_safety(self.color).restrict(self, moves)
 
 
 class Pawn(Piece):
     SYMBOL = 'P'
     RANGE = 1
+    VALUE = 100
+    START_RANK = {WHITE: 2, BLACK: 7}
+    PROMOTION_RANK = {WHITE: 8, BLACK: 1}
 
     def get_attack_vector_directions(self):
         return ['NE', 'NW'] if self.color == WHITE else ['SE', 'SW']
 
-    def get_legal_moves(self):
-        # A pawn can push two squares forward on first move, otherwise it can
-        # only push one square
-        range = self.RANGE if self.moved else 2
+    def _can_capture_en_passant(self):
+        en_passant = self.board.en_passant
+        if not en_passant:
+            return False
 
-        if self.color == WHITE:
-            file_vector = self._attack_vectors(
-                    ['N'], range=range, can_capture=False)[0]
-        else:
-            file_vector = self._attack_vectors(
-                    ['S'], range=range, can_capture=False)[0]
+        if en_passant not in self.get_squares_this_piece_attacks():
+            return False
+
+        # The pawn that just pushed two squares sits beside us
+        piece = self.board[en_passant[0]][self.rank]
+        if not (piece is not None and piece.__class__ == Pawn and
+                piece.color != self.color):
+            return False
 
-        file_squares = {sq for sq in file_vector}
-        return super(Pawn, self).get_legal_moves() | file_squares
+        # Both pawns leave their squares, which can expose our king
+        king = self.board.king_safety(self.color).king
+        return not (king and checks.exposed_to_slider(
+            self.board, self.color, king,
+            vacated=((self.file, self.rank), (piece.file, piece.rank)),
+            occupied=(en_passant,)))
+
+    @cached_by_square
+    def get_legal_moves(self):
+        # A pawn can push two squares forward from its starting rank,
+        # otherwise it can only push one square
+        range = 2 if self.rank == self.START_RANK[self.color] else self.RANGE
+
+        direction = 'N' if self.color == WHITE else 'S'
+        file_vector = self._attack_vectors(
+                [direction], range=range, can_capture=False)[0]
+        push_squares = {sq for sq in file_vector
+                        if not self.board[sq[0]][sq[1]]}
+
+        # Pawns only move diagonally when capturing
+        opposite_color = BLACK if self.color == WHITE else WHITE
+        capture_squares = (self.get_squares_this_piece_attacks() &
+                           self.board.occupied_squares(opposite_color))
+        if self._can_capture_en_passant():
+            capture_squares |= {self.board.en_passant}
+
+        moves = push_squares | capture_squares
+        safety = self.board.king_safety(self.color)
+        legal_moves = safety.restrict(self, moves)
+
+        # Capturing en passant removes a checking pawn without landing on
+        # its square
+        en_passant = self.board.en_passant
+        if (en_passant in moves and len(safety.checkers) == 1 and
+                safety.checkers[0] == (en_passant[0], self.rank) and
+                en_passant in safety.pins.get((self.file, self.rank),
+                                              {en_passant})):
+            legal_moves |= {en_passant}
+
+        return legal_moves
+
+    def _pre_move_hook(self, new_file, new_rank):
+        if ((new_file, new_rank) == self.board.en_passant and
+                not self.board[new_file][new_rank]):
+            other_piece = self.board[new_file][self.rank]
+            self._capture(other_piece)
+            self.board._take(other_piece)
 
 
 class Knight(Piece):
     SYMBOL = 'N'
     RANGE = None
-    MOVE_MAP = [(2, 1), (1, 2), (-1, 2), (-2, 1),
-                (-2, -1), (-1, -2), (1, -2), (2, -1)]
+    VALUE = 320
 
     def get_attack_vectors(self):
-        vectors = []
-        old_file_idx = FILES.index(self.file)
-        old_rank_idx = RANKS.index(self.rank)
-
-        def _traverse_knight(file_delta, rank_delta):
-            try:
-                new_file = FILES[old_file_idx + file_delta]
-            except IndexError:
-                return
-            try:
-                new_rank = RANKS[old_rank_idx + rank_delta]
-            except IndexError:
-                return
-
-            piece = self.board[new_file][new_rank]
-            if piece and piece.color == self.color:
-                pass
-            else:
-                vector = [(new_file, new_rank)]
-                vectors.append(vector)
-
-        for file_delta, rank_delta in self.MOVE_MAP:
-            _traverse_knight(file_delta, rank_delta)
-
-        return vectors
+        # Squares with our own pieces are included since they are defended,
+        # just like a slider's blocked square
+        return [[square] for square in
+                tables.knight_jumps()[(self.file, self.rank)]]
 
 
 class Bishop(Piece):
     SYMBOL = 'B'
     RANGE = INFINITY
+    VALUE = 330
 
     def get_attack_vector_directions(self):
         return ['NE', 'SE', 'SW', 'NW']
@@ -254,6 +270,7 @@ class Bishop(Piece):
 class Rook(Piece):
     SYMBOL = 'R'
     RANGE = INFINITY
+    VALUE = 500
 
     def get_attack_vector_directions(self):
         return ['N', 'E', 'S', 'W']
@@ -262,6 +279,7 @@ class Rook(Piece):
 class Queen(Piece):
     SYMBOL = 'Q'
     RANGE = INFINITY
+    VALUE = 900
 
     def get_attack_vector_directions(self):
         return ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']
@@ -270,64 +288,111 @@ class Queen(Piece):
 class King(Piece):
     SYMBOL = 'K'
     RANGE = 1
+    VALUE = 20000
 
     def get_attack_vector_directions(self):
         return ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']
 
-    def _can_castle(self, king_target_file, rook_file):
-        attacked_squares = self.board.attacked_squares(self.color)
+    HOME_RANK = {WHITE: 1, BLACK: 8}
+    KING_SIDE = {WHITE: WHITE_KING_SIDE, BLACK: BLACK_KING_SIDE}
+    QUEEN_SIDE = {WHITE: WHITE_QUEEN_SIDE, BLACK: BLACK_QUEEN_SIDE}
+
+    def _can_castle(self, castling_right, king_target_file, rook_file):
+        if not self.board.castling_rights & castling_right:
+            return False
+
+        rank = self.HOME_RANK[self.color]
+        if (self.file, self.rank) != ('e', rank):
+            return False
 
-        piece = self.board[rook_file][1]
+        piece = self.board[rook_file][rank]
 
         if not piece:
             return False
 
-        if piece.__class__ != Rook:
+        if piece.__class__ != Rook or piece.color != self.color:
             return False
 
+        # Squares between the king and rook must be empty
+        for file in self._get_files_in_between_inclusive(rook_file)[1:-1]:
+            if self.board[file][rank]:
+                return False
+
         # King cannot pass through an attacked square
-        king_path = {(f, 1) for f in self._get_files_in_between_inclusive(king_target_file)[1:]}
+        attacked_squares = self.board.attacked_squares(self.color)
+        king_path = {(f, rank) for f in self._get_files_in_between_inclusive(king_target_file)[1:]}
         if king_path & attacked_squares:
             return False
 
-        return not self.moved and not self.in_check()
+        return (self.file, self.rank) not in attacked_squares
 
     def can_castle_king_side(self):
-        return self._can_castle('g', 'h')
+        return self._can_castle(self.KING_SIDE[self.color], 'g', 'h')
 
     def can_castle_queen_side(self):
-        return self._can_castle('c', 'a')
+        return self._can_castle(self.QUEEN_SIDE[self.color], 'c', 'a')
 
+    @cached_by_square
     def get_legal_moves(self):
         attacked_squares = self.board.attacked_squares(self.color)
         castle_squares = set()
+        rank = self.HOME_RANK[self.color]
 
         # King-side castling
         if self.can_castle_king_side():
-            castle_squares.add(('g', 1))
+            castle_squares.add(('g', rank))
 
         # Queen-side castling
         if self.can_castle_queen_side():
-            castle_squares.add(('c', 1))
+            castle_squares.add(('c', rank))
 
-        return super(King, self).get_legal_moves() - attacked_squares | castle_squares
+        # The king can't step back along the line of a slider checking it
+        xray_squares = self.board.king_safety(self.color).xray_squares
+
+        return (self._get_pseudo_legal_moves() - attacked_squares -
+                xray_squares | castle_squares)
 
     def _pre_move_hook(self, new_file, new_rank):
-        if (self.file, self.rank) == ('e', 1):
-            if (new_file, new_rank) == ('g', 1):
+        rank = self.HOME_RANK[self.color]
+        if (self.file, self.rank) == ('e', rank) and new_rank == rank:
+            if new_file == 'g':
                 # King-side castling so move king-side rook
-                self.board['h'][1].move('f', 1)
-            elif (new_file, new_rank) == ('c', 1):
+                self._move_castling_rook('h', 'f')
+            elif new_file == 'c':
                 # Queen-side castling so move queen-side rook
-                self.board['a'][1].move('d', 1)
+                self._move_castling_rook('a', 'd')
+
+    def _move_castling_rook(self, rook_file, new_rook_file):
+        rook = self.board[rook_file][self.rank]
+        self.board._take(rook)
+        self.board._put(rook, new_rook_file, self.rank)
+        rook.moved = True
 
     def in_check(self):
         """A king is in check if he is attacked by any of his opponents
         pieces
         """
-        return (self.file, self.rank) in self.board.attacked_squares(self.color)
+        return self.board.king_safety(self.color).in_check
 
     def is_checkmated(self):
-        return (self.in_check() and not
-                self.get_legal_moves() and not
-                self._can_interpose_upon_attack())
+        safety = self.board.king_safety(self.color)
+        if not safety.in_check or self.get_legal_moves():
+            return False
+
+        if len(safety.checkers) > 1:
+            return True
+
+        # Other pieces' moves are already restricted to capturing or
+        # blocking the checker
+        for piece in self.board.get_pieces_by_color(self.color):
+            if piece is not self and piece.get_legal_moves():
+                return False
+
+        return True
+
+
+PIECES_BY_SYMBOL = dict((cls.SYMBOL, cls) for cls in
+                        (Pawn, Knight, Bishop, Rook, Queen, King))
+
+# What a pawn may promote to, most valuable first
+PROMOTION_PIECES = (Queen, Rook, Bishop, Knight)
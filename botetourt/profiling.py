@@ -0,0 +1,118 @@
+"""Optional instrumentation for the move generation hot paths.
+
+The hooks are only swapped into `Board` and the piece classes while a
+`profile()` block is active, so there is no cost when profiling is disabled:
+
+    with profile() as stats:
+        king.is_checkmated()
+    print(stats.report())
+
+Counters are keyed by the qualified name of the instrumented method. Time is
+inclusive (it includes callees) and re-entrant calls to the same method are
+only timed once. Instrumentation is process-wide and not thread-safe.
+"""
+import contextlib
+import functools
+from timeit import default_timer
+
+from botetourt.board import Board
+from botetourt.pieces import Piece, Pawn, Knight, King
+
+
+# (category, class, method name) of every instrumented method
+HOOKS = [
+    ('attack_vectors', Piece, '_attack_vectors'),
+    ('attack_vectors', Knight, 'get_attack_vectors'),
+    ('attacked_squares', Board, 'attacked_squares'),
+    ('legal_moves', Piece, 'get_legal_moves'),
+    ('legal_moves', Pawn, 'get_legal_moves'),
+    ('legal_moves', King, 'get_legal_moves'),
+    ('check_detection', Board, 'king_safety'),
+    ('check_detection', King, 'in_check'),
+    ('check_detection', King, 'is_checkmated'),
+]
+
+_active = False
+
+
+class Counter(object):
+    def __init__(self, category, name):
+        self.category = category
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self._depth = 0
+
+
+class Stats(object):
+    def __init__(self):
+        self.counters = {}
+
+    def _counter(self, category, name):
+        counter = self.counters.get(name)
+        if counter is None:
+            counter = self.counters[name] = Counter(category, name)
+        return counter
+
+    def by_category(self):
+        """Return {category: (calls, seconds)} totals."""
+        totals = {}
+        for counter in self.counters.values():
+            calls, seconds = totals.get(counter.category, (0, 0.0))
+            totals[counter.category] = (calls + counter.calls,
+                                        seconds + counter.seconds)
+        return totals
+
+    def report(self):
+        lines = ['%-30s %10s %12s' % ('method', 'calls', 'seconds')]
+        counters = sorted(self.counters.values(), key=lambda c: -c.seconds)
+        for counter in counters:
+            lines.append('%-30s %10d %12.6f' % (
+                counter.name, counter.calls, counter.seconds))
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return self.report()
+
+
+def _instrument(func, counter):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        counter.calls += 1
+        if counter._depth:
+            return func(*args, **kwargs)
+
+        counter._depth += 1
+        start = default_timer()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            counter.seconds += default_timer() - start
+            counter._depth -= 1
+    return wrapper
+
+
+@contextlib.contextmanager
+def profile():
+    """Instrument the hot paths for the duration of the block and yield the
+    `Stats` collecting the counters.
+    """
+    global _active
+    if _active:
+        raise RuntimeError('profiling is already enabled')
+
+    stats = Stats()
+    originals = []
+    for category, cls, name in HOOKS:
+        func = cls.__dict__[name]
+        originals.append((cls, name, func))
+        counter = stats._counter(category, '%s.%s' % (cls.__name__, name))
+        setattr(cls, name, _instrument(func, counter))
+
+    _active = True
+    try:
+        yield stats
+    finally:
+        for cls, name, func in originals:
+            setattr(cls, name, func)
+        _active = False
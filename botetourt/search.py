@@ -0,0 +1,442 @@
+"""Search and evaluation.
+
+Searches store what they learn about each position in a
+`TranspositionTable`. Passing the same table to several searches lets later
+ones reuse that work, which is what `search_many` does for the positions of
+a game, since part of the tree searched from one position is searched again
+from the next.
+"""
+import collections
+from timeit import default_timer
+
+from botetourt import movegen
+from botetourt.exc import SearchStopped
+from botetourt.see import see
+
+
+MATE = 100000
+INFINITY = 1000000
+
+# Killer moves remembered per ply
+NUM_KILLERS = 2
+
+# Deepest iteration when only time or nodes limit the search, and the depth
+# searched when nothing limits it
+MAX_DEPTH = 64
+DEFAULT_DEPTH = 4
+
+# Nodes, quiescence nodes included, searched between checks of the clock,
+# node budget and `should_stop`. The search runs at 4,000 to 7,000 nodes per
+# second, so this checks every 5 to 8 milliseconds.
+CHECK_INTERVAL = 32
+
+# Time management: moves assumed left when the clock has no moves to go, the
+# seconds kept back per move for communication, and how far past its share
+# of the clock a move may run when an iteration doesn't finish in time
+DEFAULT_MOVES_TO_GO = 30
+MOVE_OVERHEAD = 0.05
+HARD_TIME_FACTOR = 3
+
+# Transposition table entries at most, and what an entry's score is: the
+# exact score, or only a lower or upper bound on it when the search of the
+# position was cut off or failed low
+DEFAULT_TABLE_SIZE = 1 << 18
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+def evaluate(board):
+    """Return the material balance in centipawns from the point of view of
+    the side to move.
+    """
+    score = 0
+    for piece in board._get_pieces():
+        if piece.SYMBOL == 'K':
+            continue
+        if piece.color == board.turn:
+            score += piece.VALUE
+        else:
+            score -= piece.VALUE
+    return score
+
+
+def quiescence(board, alpha, beta):
+    """Return the score of `board` after a quiescence search without
+    limits, see `Search.quiescence`.
+    """
+    return Search(board).quiescence(alpha, beta)
+
+
+def find_king(board, color):
+    for piece in board.get_pieces_by_color(color):
+        if piece.SYMBOL == 'K':
+            return piece
+    return None
+
+
+def in_check(board, color):
+    king = find_king(board, color)
+    return king is not None and king.in_check()
+
+
+def allocate_time(remaining, increment=0, moves_to_go=None,
+                  overhead=MOVE_OVERHEAD):
+    """Return the (soft, hard) time in seconds to spend on a move, given
+    the time `remaining` on the clock and the `increment` per move.
+    """
+    available = max(remaining - overhead, 0)
+    # Clocks are often given in whole seconds
+    share = (float(available) / (moves_to_go or DEFAULT_MOVES_TO_GO) +
+             increment)
+    hard = min(share * HARD_TIME_FACTOR, available)
+    return min(share, hard), hard
+
+
+class Limits(object):
+    """When a search has to stop.
+
+    `hard_time` (seconds) and `max_nodes` stop a search in the middle of an
+    iteration, and are only checked every `check_interval` nodes.
+    `soft_time` is checked between iterations: no new iteration is started
+    once it has passed, or when the last one suggests the next won't finish
+    before `hard_time`.
+    """
+    def __init__(self, soft_time=None, hard_time=None, max_nodes=None,
+                 check_interval=CHECK_INTERVAL):
+        self.soft_time = soft_time
+        self.hard_time = hard_time
+        self.max_nodes = max_nodes
+        self.check_interval = check_interval
+
+    @classmethod
+    def from_clock(cls, remaining, increment=0, moves_to_go=None, **kwargs):
+        soft_time, hard_time = allocate_time(remaining, increment,
+                                             moves_to_go)
+        return cls(soft_time=soft_time, hard_time=hard_time, **kwargs)
+
+
+def _is_mate_score(score):
+    return abs(score) > MATE - 1000
+
+
+class TranspositionTable(object):
+    """Search results by position hash: (depth, score, bound, best move).
+
+    Mate scores are stored relative to the position rather than the root,
+    so an entry is valid wherever the position is reached. Once `maxsize`
+    positions are stored the table starts over.
+    """
+    def __init__(self, maxsize=DEFAULT_TABLE_SIZE):
+        self.maxsize = maxsize
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+
+    def get(self, position_hash, ply=0):
+        """Return the entry for a position `ply` moves from the root, or
+        None.
+        """
+        entry = self._entries.get(position_hash)
+        if entry is None or not _is_mate_score(entry[1]):
+            return entry
+        depth, score, bound, move = entry
+        score = score - ply if score > 0 else score + ply
+        return depth, score, bound, move
+
+    def store(self, position_hash, depth, score, bound, move, ply=0):
+        entries = self._entries
+        if len(entries) >= self.maxsize and position_hash not in entries:
+            entries.clear()
+        if _is_mate_score(score):
+            score = score + ply if score > 0 else score - ply
+        entries[position_hash] = (depth, score, bound, move)
+
+    def best_move(self, position_hash):
+        entry = self._entries.get(position_hash)
+        return entry[3] if entry is not None else None
+
+
+class Search(object):
+    """Iterative deepening alpha-beta search.
+
+    `should_stop` is polled along with the `limits` every
+    `limits.check_interval` nodes; once the search has to stop it unwinds,
+    restoring the board, and no further iterations are reported.
+
+    With `multipv` above 1 each iteration reports that many of the best
+    lines from the root, see `search_root`. A `table` may be shared with
+    other searches.
+    """
+    def __init__(self, board, should_stop=None, limits=None, multipv=1,
+                 table=None):
+        self.board = board
+        self.should_stop = should_stop
+        self.limits = limits or Limits()
+        self.multipv = multipv
+        self.nodes = 0
+        self.table = TranspositionTable() if table is None else table
+        self.killers = collections.defaultdict(list)
+        self._next_check = 0
+        self._deadline = None
+
+    def _check_limits(self):
+        self._next_check = self.nodes + self.limits.check_interval
+        if self.should_stop is not None and self.should_stop():
+            raise SearchStopped
+        max_nodes = self.limits.max_nodes
+        if max_nodes is not None and self.nodes >= max_nodes:
+            raise SearchStopped
+        if self._deadline is not None and default_timer() >= self._deadline:
+            raise SearchStopped
+
+    def _store_killer(self, ply, move):
+        killers = self.killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[NUM_KILLERS:]
+
+    def quiescence(self, alpha, beta):
+        """Capture-only search used at the leaves of the main search so that
+        it only ever scores quiet positions.
+
+        The side to move may "stand pat" on the static evaluation instead of
+        capturing, and captures that lose material according to SEE are
+        pruned.
+        """
+        self.nodes += 1
+        if self.nodes >= self._next_check:
+            self._check_limits()
+
+        board = self.board
+        stand_pat = evaluate(board)
+        if stand_pat >= beta:
+            return beta
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        for move in movegen.generate_captures(board):
+            if see(board, move) < 0:
+                continue
+
+            board.make_move(*move)
+            try:
+                score = -self.quiescence(-beta, -alpha)
+            finally:
+                board.unmake_move()
+
+            if score >= beta:
+                return beta
+            if score > alpha:
+                alpha = score
+
+        return alpha
+
+    def negamax(self, depth, alpha, beta, ply=0):
+        """Return (score, principal variation) for the side to move."""
+        if depth <= 0:
+            return self.quiescence(alpha, beta), []
+
+        self.nodes += 1
+        if self.nodes >= self._next_check:
+            self._check_limits()
+
+        board = self.board
+        table = self.table
+        hash_move = None
+        entry = table.get(board.hash, ply)
+        if entry is not None:
+            entry_depth, score, bound, hash_move = entry
+            if ply and entry_depth >= depth:
+                if bound == EXACT:
+                    return score, [hash_move] if hash_move else []
+                if bound == LOWER and score >= beta:
+                    return beta, []
+                if bound == UPPER and score <= alpha:
+                    return alpha, []
+
+        color = board.turn
+        original_alpha = alpha
+        best_move = None
+        best_pv = []
+        legal_moves = 0
+
+        moves = movegen.staged_moves(board, hash_move=hash_move,
+                                     killers=self.killers[ply])
+        for stage, move in moves:
+            board.make_move(*move)
+            try:
+                if in_check(board, color):
+                    continue
+                legal_moves += 1
+                score, pv = self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                board.unmake_move()
+
+            score = -score
+            if score > alpha:
+                alpha = score
+                best_move = move
+                best_pv = [move] + pv
+            if alpha >= beta:
+                if stage in (movegen.KILLERS, movegen.QUIETS):
+                    self._store_killer(ply, move)
+                break
+
+        if not legal_moves:
+            if in_check(board, color):
+                return -MATE + ply, []
+            return 0, []
+
+        if alpha >= beta:
+            bound = LOWER
+        elif alpha > original_alpha:
+            bound = EXACT
+        else:
+            bound = UPPER
+        table.store(board.hash, depth, alpha, bound, best_move, ply)
+
+        return alpha, best_pv
+
+    def search_root(self, depth, multipv=1, previous=()):
+        """Return the `multipv` best (score, principal variation) lines for
+        the side to move, best first, each with its exact score.
+
+        Every root move is searched with the window of the worst line kept
+        so far, so moves that can't make the list fail low quickly. The
+        moves of `previous` lines are searched first.
+        """
+        board = self.board
+        color = board.turn
+        first = [pv[0] for _, pv in previous if pv]
+        moves = first + [move for _, move in movegen.staged_moves(
+            board, hash_move=self.table.best_move(board.hash),
+            killers=self.killers[0]) if move not in first]
+
+        self.nodes += 1
+        if self.nodes >= self._next_check:
+            self._check_limits()
+        lines = []
+        for move in moves:
+            board.make_move(*move)
+            try:
+                if in_check(board, color):
+                    continue
+                if len(lines) < multipv:
+                    alpha = -INFINITY
+                else:
+                    alpha = lines[-1][0]
+                score, pv = self.negamax(depth - 1, -INFINITY, -alpha, 1)
+            finally:
+                board.unmake_move()
+
+            score = -score
+            if score > alpha:
+                # Stable, so equal scores keep the order moves were searched
+                lines.append((score, [move] + pv))
+                lines.sort(key=lambda line: -line[0])
+                del lines[multipv:]
+
+        if not lines:
+            if in_check(board, color):
+                return [(-MATE, [])]
+            return [(0, [])]
+
+        score, pv = lines[0]
+        self.table.store(board.hash, depth, score, EXACT, pv[0])
+        return lines
+
+    def iterate(self, max_depth=MAX_DEPTH):
+        """Yield a dict describing each completed iteration up to
+        `max_depth`.
+
+        Along with the score and principal variation, each dict has the
+        `multipv` best `lines` as dicts with a `score` and `pv`. It also
+        reports the total `nodes`, `seconds` and nodes per second (`nps`) so
+        far, and the effective branching factor (`ebf`): the nodes this
+        iteration took relative to the previous one.
+        """
+        limits = self.limits
+        start = default_timer()
+        if limits.hard_time is not None:
+            self._deadline = start + limits.hard_time
+        self._next_check = 0
+
+        previous_nodes = None
+        lines = ()
+        for depth in xrange(1, max_depth + 1):
+            iteration_start = default_timer()
+            nodes_before = self.nodes
+            try:
+                lines = self.search_root(depth, self.multipv, lines)
+            except SearchStopped:
+                return
+            now = default_timer()
+
+            seconds = now - start
+            nodes = self.nodes - nodes_before
+            ebf = float(nodes) / previous_nodes if previous_nodes else None
+            previous_nodes = nodes
+            score, pv = lines[0]
+            yield {'depth': depth, 'score': score, 'pv': pv,
+                   'lines': [{'score': line_score, 'pv': line_pv}
+                             for line_score, line_pv in lines],
+                   'nodes': self.nodes, 'seconds': seconds,
+                   'nps': int(self.nodes / seconds) if seconds else 0,
+                   'ebf': ebf}
+
+            if limits.soft_time is not None:
+                if seconds >= limits.soft_time:
+                    return
+                # The next iteration will likely take `ebf` times as long
+                if (self._deadline is not None and ebf is not None and
+                        now + (now - iteration_start) * ebf >=
+                        self._deadline):
+                    return
+
+
+def search(board, depth=None, should_stop=None, limits=None, multipv=1,
+           table=None):
+    """Search `board` to `depth` and return the info for the deepest
+    completed iteration, or None if it was stopped before depth 1.
+
+    Without a `depth` the search goes up to `MAX_DEPTH` when `limits` or
+    `should_stop` can end it, and to `DEFAULT_DEPTH` otherwise.
+    """
+    if depth is None:
+        if limits is None and should_stop is None:
+            depth = DEFAULT_DEPTH
+        else:
+            depth = MAX_DEPTH
+    info = None
+    searcher = Search(board, should_stop=should_stop, limits=limits,
+                      multipv=multipv, table=table)
+    for info in searcher.iterate(depth):
+        pass
+    return info
+
+
+def search_many(positions, depth=None, should_stop=None, limits=None,
+                multipv=1, table=None):
+    """Search each of `positions` (boards or FENs) in turn, yielding the
+    info `search` would return for each, in the same order. `depth`
+    defaults as for `search`.
+
+    All the searches share one transposition table, so consecutive
+    positions of a game are cheaper to search than on their own.
+    `limits` apply to each position separately.
+    """
+    # Importing the board here would double the time it takes to import
+    # this module
+    from botetourt import fen
+    if table is None:
+        table = TranspositionTable()
+    for position in positions:
+        if isinstance(position, basestring):
+            position = fen.loads(position)
+        yield search(position, depth, should_stop=should_stop, limits=limits,
+                     multipv=multipv, table=table)
@@ -0,0 +1,100 @@
+"""Static exchange evaluation (SEE).
+
+SEE resolves the sequence of captures on a single square, assuming both sides
+always recapture with their least valuable attacker and may stop whenever
+continuing would lose material. It works from attacker lists derived from the
+board and picks up x-ray attackers (e.g. a rook behind a rook) as the pieces
+in front of them are traded off.
+"""
+from botetourt import tables
+from botetourt.consts import WHITE, BLACK
+from botetourt.movegen import captured_piece
+from botetourt.pieces import Bishop, King, Knight, Pawn, Queen, Rook
+from botetourt.tables import ORTHOGONAL, DIAGONAL
+
+
+def attackers(board, square, color, ignore=()):
+    """Return the pieces of `color` attacking `square`, treating the squares
+    in `ignore` as empty.
+    """
+    found = []
+
+    for sq in tables.knight_jumps()[square]:
+        if sq not in ignore:
+            piece = board[sq[0]][sq[1]]
+            if piece and piece.color == color and piece.__class__ == Knight:
+                found.append(piece)
+
+    # A pawn attacks diagonally forward, so look diagonally backward for it
+    pawn_rank_delta = -1 if color == WHITE else 1
+
+    rays = tables.rays()[square]
+    for directions, sliders in ((ORTHOGONAL, (Rook, Queen)),
+                                (DIAGONAL, (Bishop, Queen))):
+        for direction in directions:
+            rank_delta = direction[1]
+            for distance, sq in enumerate(rays[direction], 1):
+                if sq in ignore:
+                    continue
+                piece = board[sq[0]][sq[1]]
+                if not piece:
+                    continue
+                if piece.color != color:
+                    break
+                if piece.__class__ in sliders:
+                    found.append(piece)
+                elif distance == 1 and piece.__class__ == King:
+                    found.append(piece)
+                elif (distance == 1 and piece.__class__ == Pawn and
+                        directions is DIAGONAL and
+                        rank_delta == pawn_rank_delta):
+                    found.append(piece)
+                break
+
+    return found
+
+
+def _least_valuable(pieces):
+    return min(pieces, key=lambda piece: piece.VALUE) if pieces else None
+
+
+def see(board, move):
+    """Return the expected material gain, in centipawns, for the side making
+    the capture `move` once the exchange on the target square has played out.
+    """
+    file, rank, new_file, new_rank = move[:4]
+    target = (new_file, new_rank)
+    piece = board[file][rank]
+    victim = captured_piece(board, move)
+
+    gains = [victim.VALUE if victim else 0]
+    ignore = {(file, rank)}
+    if victim and (victim.file, victim.rank) != target:
+        # En passant
+        ignore.add((victim.file, victim.rank))
+
+    on_square = piece
+    color = BLACK if piece.color == WHITE else WHITE
+    while True:
+        attacker = _least_valuable(attackers(board, target, color, ignore))
+        if attacker is None:
+            break
+
+        other_color = BLACK if color == WHITE else WHITE
+        if (attacker.__class__ == King and
+                attackers(board, target, other_color,
+                          ignore | {(attacker.file, attacker.rank)})):
+            # The king can't recapture onto a defended square
+            break
+
+        gains.append(on_square.VALUE - gains[-1])
+        ignore.add((attacker.file, attacker.rank))
+        on_square = attacker
+        color = other_color
+
+    # Either side may stop capturing if continuing loses material
+    while len(gains) > 1:
+        gain = gains.pop()
+        gains[-1] = -max(-gains[-1], gain)
+
+    return gains[0]
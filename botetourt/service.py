@@ -0,0 +1,285 @@
+"""Analysis service backed by a bounded pool of worker processes.
+
+    with AnalysisService(workers=4) as service:
+        analysis = service.analyze(fen, depth=6, timeout=2.0)
+        for info in analysis:
+            print(info['depth'], info['score'], info['pv'])
+
+Each worker process pre-warms its tables on start-up and then runs one search
+at a time, streaming an info dict back after every completed iteration of
+iterative deepening. At most `max_pending` analyses are accepted at once;
+beyond that `analyze` blocks (or raises `ServiceBusy`), which gives callers
+backpressure. In-flight searches can be cancelled and stop by themselves once
+their deadline passes.
+
+`make_server` exposes a service over a local TCP socket using one JSON object
+per line.
+"""
+import json
+import multiprocessing
+import Queue
+import socket
+import SocketServer
+import threading
+import time
+
+from botetourt import fen, movegen, search
+from botetourt.exc import AnalysisFailed, ServiceBusy
+
+
+DEFAULT_DEPTH = search.DEFAULT_DEPTH
+
+_INFO = 'info'
+_ERROR = 'error'
+_DONE = 'done'
+
+
+def _worker(jobs, results, cancelled):
+    # Pre-warm: importing builds the Zobrist tables and a shallow search
+    # brings the move generation code paths in before the first request
+    search.search(fen.loads(fen.STARTING_POSITION), 1)
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+
+        request_id, slot, position, depth, deadline = job
+
+        def should_stop():
+            return bool(cancelled[slot]) or (
+                deadline is not None and time.time() >= deadline)
+
+        try:
+            board = fen.loads(position)
+            searcher = search.Search(board, should_stop=should_stop)
+            for info in searcher.iterate(depth):
+                for line in [info] + info['lines']:
+                    line['pv'] = [movegen.format_move(move)
+                                  for move in line['pv']]
+                results.put((request_id, _INFO, info))
+        except Exception as e:
+            # Whatever goes wrong, the worker has to survive and the slot
+            # has to be released
+            results.put((request_id, _ERROR, '%s: %s' % (
+                e.__class__.__name__, e)))
+        finally:
+            results.put((request_id, _DONE, None))
+
+
+def _is_integer(value):
+    # JSON booleans are ints as far as `isinstance` is concerned
+    return isinstance(value, (int, long)) and not isinstance(value, bool)
+
+
+def _validate(position, depth, timeout):
+    if not isinstance(position, basestring):
+        raise ValueError('fen must be a string')
+    if not _is_integer(depth) or not 1 <= depth <= search.MAX_DEPTH:
+        raise ValueError('depth must be an integer from 1 to %d' %
+                         search.MAX_DEPTH)
+    if timeout is not None and not (
+            (_is_integer(timeout) or isinstance(timeout, float)) and
+            timeout >= 0):
+        raise ValueError('timeout must be a non-negative number')
+
+
+class Analysis(object):
+    """Handle on a submitted analysis. Iterate over it to receive the info
+    for each completed depth as it arrives.
+    """
+    def __init__(self, service, request_id, slot):
+        self.request_id = request_id
+        self.done = False
+        # Set by the dispatcher before the slot is handed to another analysis
+        self._finished = False
+        self._service = service
+        self._slot = slot
+        self._messages = Queue.Queue()
+
+    def __iter__(self):
+        while not self.done:
+            kind, payload = self._messages.get()
+            if kind == _DONE:
+                self.done = True
+            elif kind == _ERROR:
+                self.done = True
+                raise AnalysisFailed(payload)
+            else:
+                yield payload
+
+    def cancel(self):
+        """Stop the search. Iteration ends once the worker has unwound."""
+        with self._service._lock:
+            if not self._finished:
+                self._service._cancelled[self._slot] = 1
+
+    def result(self):
+        """Wait for the analysis to finish and return the deepest info, or
+        None if no iteration completed.
+        """
+        info = None
+        for info in self:
+            pass
+        return info
+
+
+class AnalysisService(object):
+    def __init__(self, workers=None, max_pending=None):
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        if max_pending is None:
+            max_pending = 2 * workers
+
+        # Each accepted analysis holds a slot until it is done. The slot
+        # indexes its cancellation flag, which is shared with the workers.
+        self._slots = Queue.Queue()
+        for slot in range(max_pending):
+            self._slots.put(slot)
+        self._cancelled = multiprocessing.Array('b', max_pending, lock=False)
+
+        self._jobs = multiprocessing.Queue()
+        self._results = multiprocessing.Queue()
+        self._analyses = {}
+        self._lock = threading.Lock()
+        self._next_request_id = 0
+        self._closed = False
+
+        self._workers = []
+        for _ in range(workers):
+            process = multiprocessing.Process(
+                target=_worker,
+                args=(self._jobs, self._results, self._cancelled))
+            process.daemon = True
+            process.start()
+            self._workers.append(process)
+
+        self._dispatcher = threading.Thread(target=self._dispatch)
+        self._dispatcher.daemon = True
+        self._dispatcher.start()
+
+    def _dispatch(self):
+        """Route results from the workers to their `Analysis`."""
+        while True:
+            message = self._results.get()
+            if message is None:
+                return
+
+            request_id, kind, payload = message
+            with self._lock:
+                analysis = self._analyses[request_id]
+                if kind == _DONE:
+                    del self._analyses[request_id]
+                    analysis._finished = True
+
+            if kind == _DONE:
+                self._slots.put(analysis._slot)
+            analysis._messages.put((kind, payload))
+
+    def analyze(self, position, depth=DEFAULT_DEPTH, timeout=None,
+                block=True, wait=None):
+        """Submit a FEN for analysis and return its `Analysis`.
+
+        The search stops after `depth` iterations or `timeout` seconds,
+        whichever comes first. If the service is at capacity this blocks for
+        up to `wait` seconds (forever if None), or not at all if `block` is
+        False, before raising `ServiceBusy`.
+
+        Raises `ValueError` if `position` isn't a string, `depth` isn't an
+        integer from 1 to `search.MAX_DEPTH` or `timeout` isn't a
+        non-negative number.
+        """
+        _validate(position, depth, timeout)
+        if self._closed:
+            raise ServiceBusy('service is closed')
+
+        try:
+            slot = self._slots.get(block, wait)
+        except Queue.Empty:
+            raise ServiceBusy('too many analyses in progress')
+
+        deadline = time.time() + timeout if timeout is not None else None
+        self._cancelled[slot] = 0
+
+        with self._lock:
+            request_id = self._next_request_id
+            self._next_request_id += 1
+            analysis = Analysis(self, request_id, slot)
+            self._analyses[request_id] = analysis
+
+        self._jobs.put((request_id, slot, position, depth, deadline))
+        return analysis
+
+    def close(self):
+        """Cancel outstanding analyses and shut down the workers."""
+        if self._closed:
+            return
+        self._closed = True
+
+        with self._lock:
+            analyses = list(self._analyses.values())
+        for analysis in analyses:
+            analysis.cancel()
+
+        for _ in self._workers:
+            self._jobs.put(None)
+        for process in self._workers:
+            process.join()
+
+        self._results.put(None)
+        self._dispatcher.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _AnalysisHandler(SocketServer.StreamRequestHandler):
+    """Line protocol: each request is a JSON object with `fen` and optionally
+    `depth` and `timeout`. Each info is written back as a JSON line, followed
+    by {"done": true} or {"error": "..."}. Disconnecting cancels the search.
+    """
+    def _write(self, obj):
+        self.wfile.write(json.dumps(obj) + '\n')
+        self.wfile.flush()
+
+    def handle(self):
+        service = self.server.service
+        for line in iter(self.rfile.readline, ''):
+            try:
+                request = json.loads(line)
+                analysis = service.analyze(
+                    request['fen'], depth=request.get('depth', DEFAULT_DEPTH),
+                    timeout=request.get('timeout'))
+            except (ValueError, KeyError, TypeError, ServiceBusy) as e:
+                self._write({'error': '%s: %s' % (e.__class__.__name__, e)})
+                continue
+
+            try:
+                for info in analysis:
+                    self._write(info)
+                self._write({'done': True})
+            except AnalysisFailed as e:
+                self._write({'error': str(e)})
+            except socket.error:
+                analysis.cancel()
+                return
+
+
+class AnalysisServer(SocketServer.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, service, address):
+        self.service = service
+        SocketServer.ThreadingTCPServer.__init__(self, address,
+                                                 _AnalysisHandler)
+
+
+def make_server(service, host='127.0.0.1', port=0):
+    """Return an `AnalysisServer` for `service`. Call `serve_forever` to
+    start it; `server_address` has the port actually bound.
+    """
+    return AnalysisServer(service, (host, port))
@@ -0,0 +1,240 @@
+"""Precomputed tables, stored in a binary artifact next to this module.
+
+Building the tables at import time would slow down every short-lived worker
+process, so they are generated once with
+
+    python -m botetourt.tables
+
+and written to `tables.bin`, which is memory-mapped when first needed. The
+Zobrist keys are unpacked as soon as `botetourt.zobrist` is imported, since a
+board can't be hashed without them. The ray and jump tables are only decoded
+the first time `rays`, `knight_jumps` or `king_steps` is called.
+
+If the artifact is missing or was written by a different version of this
+module, the tables are built in memory instead.
+
+Layout (all offsets fixed, see `SECTIONS`):
+
+    MAGIC
+    Zobrist keys    NUM_KEYS big-endian unsigned 64-bit integers
+    rays            per square and direction, RAY_WIDTH square codes
+    knight jumps    per square, JUMP_WIDTH square codes
+    king steps      per square, JUMP_WIDTH square codes
+
+Squares are coded as file index * 8 + rank index, padded with `NO_SQUARE`.
+The same codes number the bits of square bitmasks, see `SQUARE_BITS`.
+"""
+import array
+import mmap
+import os
+import struct
+
+from botetourt.consts import FILES, RANKS
+
+
+MAGIC = 'BTTBL001'
+ARTIFACT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'tables.bin')
+
+ORTHOGONAL = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+DIAGONAL = [(1, 1), (1, -1), (-1, -1), (-1, 1)]
+DIRECTIONS = ORTHOGONAL + DIAGONAL
+KNIGHT_JUMPS = [(2, 1), (1, 2), (-1, 2), (-2, 1),
+                (-2, -1), (-1, -2), (1, -2), (2, -1)]
+
+ZOBRIST_SYMBOLS = ['P', 'N', 'B', 'R', 'Q', 'K']
+# Fixed seed so that hashes are stable across processes and runs
+ZOBRIST_SEED = 0x626f74
+
+SQUARES = [(file, rank) for file in FILES for rank in RANKS]
+NO_SQUARE = 0xff
+RAY_WIDTH = max(len(FILES), len(RANKS)) - 1
+JUMP_WIDTH = 8
+
+# Bit of each square in a bitmask of squares
+SQUARE_BITS = dict((square, 1 << code) for code, square in enumerate(SQUARES))
+
+# Pieces on each square for each color, side to move, four castling rights
+# bits and en passant files
+NUM_KEYS = len(ZOBRIST_SYMBOLS) * 2 * len(SQUARES) + 1 + 4 + len(FILES)
+KEYS = struct.Struct('>%dQ' % NUM_KEYS)
+
+
+def _sections():
+    offset = len(MAGIC)
+    sections = {}
+    for name, size in (('zobrist', KEYS.size),
+                       ('rays', len(SQUARES) * len(DIRECTIONS) * RAY_WIDTH),
+                       ('knight_jumps', len(SQUARES) * JUMP_WIDTH),
+                       ('king_steps', len(SQUARES) * JUMP_WIDTH)):
+        sections[name] = (offset, size)
+        offset += size
+    return sections, offset
+
+
+SECTIONS, SIZE = _sections()
+
+
+def squares_in(mask):
+    """Return the squares whose bits are set in `mask`, in `SQUARES`
+    order.
+    """
+    return [square for code, square in enumerate(SQUARES)
+            if mask >> code & 1]
+
+
+def popcount(mask):
+    """Return the number of squares in `mask`."""
+    return bin(mask).count('1')
+
+
+def _square_code(file_idx, rank_idx):
+    if 0 <= file_idx < len(FILES) and 0 <= rank_idx < len(RANKS):
+        return file_idx * len(RANKS) + rank_idx
+    return None
+
+
+def _pad(codes, width):
+    return codes + [NO_SQUARE] * (width - len(codes))
+
+
+def _build_zobrist_keys():
+    # Only needed when (re)building the tables, so importing a board
+    # doesn't pay for `random`
+    import random
+    rand = random.Random(ZOBRIST_SEED)
+    return [rand.getrandbits(64) for _ in xrange(NUM_KEYS)]
+
+
+def _build_rays():
+    codes = []
+    for file_idx, rank_idx in _indexes():
+        for file_delta, rank_delta in DIRECTIONS:
+            ray = []
+            distance = 1
+            while True:
+                code = _square_code(file_idx + file_delta * distance,
+                                    rank_idx + rank_delta * distance)
+                if code is None:
+                    break
+                ray.append(code)
+                distance += 1
+            codes.extend(_pad(ray, RAY_WIDTH))
+    return codes
+
+
+def _build_jumps(deltas):
+    codes = []
+    for file_idx, rank_idx in _indexes():
+        jumps = [_square_code(file_idx + file_delta, rank_idx + rank_delta)
+                 for file_delta, rank_delta in deltas]
+        codes.extend(_pad([code for code in jumps if code is not None],
+                          JUMP_WIDTH))
+    return codes
+
+
+def _indexes():
+    return [(FILES.index(file), RANKS.index(rank)) for file, rank in SQUARES]
+
+
+def build():
+    """Return the contents of the table artifact."""
+    return ''.join([MAGIC,
+                    KEYS.pack(*_build_zobrist_keys()),
+                    array.array('B', _build_rays()).tostring(),
+                    array.array('B', _build_jumps(KNIGHT_JUMPS)).tostring(),
+                    array.array('B', _build_jumps(DIRECTIONS)).tostring()])
+
+
+def write(path=ARTIFACT):
+    data = build()
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.rename(tmp_path, path)
+
+
+def _map(path):
+    """Memory-map the artifact at `path`, or return None if it is missing or
+    doesn't match this version of the module.
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (IOError, OSError, ValueError):
+        return None
+    if len(data) != SIZE or data[:len(MAGIC)] != MAGIC:
+        data.close()
+        return None
+    return data
+
+
+_data = None
+
+
+def _artifact():
+    global _data
+    if _data is None:
+        data = _map(ARTIFACT)
+        _data = build() if data is None else data
+    return _data
+
+
+def _section(name):
+    offset, size = SECTIONS[name]
+    codes = array.array('B')
+    codes.fromstring(_artifact()[offset:offset + size])
+    return codes
+
+
+def _decode(codes, width):
+    """Split `codes` into one tuple of squares per square."""
+    return [tuple(SQUARES[code] for code in codes[i:i + width]
+                  if code != NO_SQUARE)
+            for i in xrange(0, len(codes), width)]
+
+
+def zobrist_keys():
+    """Return the NUM_KEYS Zobrist keys, see `botetourt.zobrist`."""
+    return KEYS.unpack_from(_artifact(), SECTIONS['zobrist'][0])
+
+
+_rays = None
+_knight_jumps = None
+_king_steps = None
+
+
+def rays():
+    """Return {square: {direction: squares moving away from it}}."""
+    global _rays
+    if _rays is None:
+        per_square = _decode(_section('rays'), RAY_WIDTH)
+        _rays = {}
+        for idx, square in enumerate(SQUARES):
+            directions = per_square[idx * len(DIRECTIONS):
+                                    (idx + 1) * len(DIRECTIONS)]
+            _rays[square] = dict(zip(DIRECTIONS, directions))
+    return _rays
+
+
+def knight_jumps():
+    """Return {square: squares a knight on it attacks}."""
+    global _knight_jumps
+    if _knight_jumps is None:
+        _knight_jumps = dict(zip(SQUARES, _decode(_section('knight_jumps'),
+                                                  JUMP_WIDTH)))
+    return _knight_jumps
+
+
+def king_steps():
+    """Return {square: squares a king on it attacks}."""
+    global _king_steps
+    if _king_steps is None:
+        _king_steps = dict(zip(SQUARES, _decode(_section('king_steps'),
+                                                JUMP_WIDTH)))
+    return _king_steps
+
+
+if __name__ == '__main__':
+    write()
+    print('wrote %d bytes to %s' % (SIZE, ARTIFACT))
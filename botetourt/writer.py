@@ -0,0 +1,207 @@
+"""Streaming writers for annotated PGN and JSON lines.
+
+Both writers consume games and analysis results one at a time, typically from
+generators, and collect the output in a small buffer that is handed to the
+underlying file in bulk once it holds `buffer_size` characters:
+
+    with PGNWriter(f) as writer:
+        for game in pgn.read_games(source):
+            writer.write_game(game.new_board(), annotated(game), game.headers)
+
+    with JSONLinesWriter(f) as writer:
+        for board, info in analysed_positions():
+            writer.write_record(analysis_record(board, info))
+
+`PGNWriter` makes each move on the board as it is written, so a generator
+passed as `plies` always sees the position its next ply is played from and can
+analyse it on the spot. Nothing but the current line is kept in memory.
+Variations are lists of moves, e.g. from `history_line`, which reads them
+straight off the make/unmake history of a board.
+"""
+import collections
+import json
+
+from botetourt import fen, movegen, pgn
+from botetourt.consts import WHITE
+from botetourt.search import MATE
+
+
+DEFAULT_BUFFER_SIZE = 1 << 16
+
+# The PGN export format keeps movetext lines below 80 characters
+MAX_LINE_LENGTH = 79
+
+# A move with optional analysis of the position it was played from, and
+# alternative lines from that position. `annotation` is an info dict as
+# produced by `botetourt.search`, and each variation is a list of moves or
+# `Ply`s.
+Ply = collections.namedtuple('Ply', ['move', 'annotation', 'variations'])
+
+
+def history_line(board, start=0):
+    """Return the moves made on `board` with `make_move` since history
+    entry `start`, oldest first.
+    """
+    return [record[0] for record in board.history[start:]]
+
+
+def format_score(score):
+    """Format a score in centipawns as pawns, or as moves to mate."""
+    if abs(score) > MATE - 1000:
+        moves = (MATE - abs(score) + 1) // 2
+        return '#%d' % moves if score > 0 else '#-%d' % moves
+    return '%+.2f' % (score / 100.0)
+
+
+def analysis_record(board, info):
+    """Return a JSON-ready dict for a search `info` on `board`."""
+    pv = [move if isinstance(move, basestring) else movegen.format_move(move)
+          for move in info['pv']]
+    return {
+        'fen': fen.dumps(board),
+        'depth': info['depth'],
+        'score': info['score'],
+        'best': pv[0] if pv else None,
+        'pv': pv,
+    }
+
+
+class BufferedWriter(object):
+    """Collects small writes and passes them on to `fileobj` in bulk."""
+    def __init__(self, fileobj, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.fileobj = fileobj
+        self.buffer_size = buffer_size
+        self._chunks = []
+        self._buffered = 0
+
+    def write(self, text):
+        self._chunks.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._chunks:
+            self.fileobj.write(''.join(self._chunks))
+            self._chunks = []
+            self._buffered = 0
+
+    def close(self):
+        """Flush the buffer. The underlying file is left open."""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class JSONLinesWriter(BufferedWriter):
+    """Writes one JSON object per line."""
+    def write_record(self, record):
+        self.write(json.dumps(record, sort_keys=True,
+                              separators=(',', ':')) + '\n')
+
+    def write_records(self, records):
+        """Write every record from an iterable, returning how many there
+        were.
+        """
+        count = 0
+        for record in records:
+            self.write_record(record)
+            count += 1
+        return count
+
+
+class PGNWriter(BufferedWriter):
+    """Writes games as PGN, with analysis as comments and variations."""
+    def __init__(self, fileobj, buffer_size=DEFAULT_BUFFER_SIZE):
+        super(PGNWriter, self).__init__(fileobj, buffer_size=buffer_size)
+        self._line_length = 0
+
+    def _token(self, token, glue=False):
+        # Movetext is wrapped by starting a new line before a token that
+        # wouldn't fit. Glued tokens follow the previous one without a space.
+        if self._line_length and not glue:
+            if self._line_length + 1 + len(token) > MAX_LINE_LENGTH:
+                self.write('\n')
+                self._line_length = 0
+            else:
+                self.write(' ')
+                self._line_length += 1
+        self.write(token)
+        self._line_length += len(token)
+
+    def _annotation(self, board, annotation):
+        comment = '%s/%d' % (format_score(annotation['score']),
+                             annotation['depth'])
+        if annotation['pv']:
+            best = annotation['pv'][0]
+            if isinstance(best, basestring):
+                best = movegen.parse_move(best)
+            comment += ' ' + pgn.san(board, best)
+        return '{%s}' % comment
+
+    def _line(self, board, plies, glue=False):
+        """Write the moves of a line, making each one on `board`. Returns
+        how many moves were made.
+        """
+        made = 0
+        # Black's move number is only repeated after something interrupts
+        # the movetext, e.g. a comment or variation
+        show_number = True
+        for ply in plies:
+            if not isinstance(ply, Ply):
+                ply = Ply(ply, None, ())
+
+            if board.turn == WHITE:
+                self._token('%d.' % board.fullmove_number, glue=glue)
+                glue = False
+            elif show_number:
+                self._token('%d...' % board.fullmove_number, glue=glue)
+                glue = False
+            self._token(pgn.san(board, ply.move), glue=glue)
+            glue = False
+            show_number = False
+
+            if ply.annotation:
+                self._token(self._annotation(board, ply.annotation))
+                show_number = True
+
+            for variation in ply.variations or ():
+                self._token('(')
+                moves = self._line(board, variation, glue=True)
+                for _ in range(moves):
+                    board.unmake_move()
+                self._token(')', glue=True)
+                show_number = True
+
+            board.make_move(*ply.move)
+            made += 1
+        return made
+
+    def write_game(self, board, plies, headers=None, result='*'):
+        """Write a game played from `board`'s position.
+
+        `plies` is an iterable of moves or `Ply`s. Each move is made on
+        `board` once it has been written, and `board` is left at the final
+        position.
+        """
+        headers = collections.OrderedDict(headers or ())
+        headers['Result'] = result
+        position = fen.dumps(board)
+        if position != fen.STARTING_POSITION:
+            headers.setdefault('SetUp', '1')
+            headers.setdefault('FEN', position)
+
+        for name, value in headers.items():
+            self.write('[%s "%s"]\n' % (
+                name, value.replace('\\', '\\\\').replace('"', '\\"')))
+        self.write('\n')
+
+        self._line_length = 0
+        self._line(board, plies)
+        self._token(result)
+        self.write('\n\n')
+        self._line_length = 0
@@ -0,0 +1,41 @@
+"""Zobrist keys used to maintain an incrementally updated position hash.
+
+Every feature of a position (a piece on a square, side to move, castling
+rights, en passant file) has a random 64-bit key. The position hash is the XOR
+of the keys of all features present, so making a move only requires XOR'ing
+out the old features and XOR'ing in the new ones.
+
+The keys are generated from a fixed seed by `botetourt.tables`, so hashes are
+stable across processes and runs, and loaded from its precomputed artifact.
+"""
+from botetourt import tables
+from botetourt.consts import WHITE, BLACK, FILES, RANKS, ALL_CASTLING_RIGHTS
+
+
+SYMBOLS = tables.ZOBRIST_SYMBOLS
+
+_keys = iter(tables.zobrist_keys())
+
+PIECES = {}
+for _symbol in SYMBOLS:
+    for _color in (WHITE, BLACK):
+        for _file in FILES:
+            for _rank in RANKS:
+                PIECES[(_symbol, _color, _file, _rank)] = next(_keys)
+
+BLACK_TO_MOVE = next(_keys)
+
+_castling_bits = [next(_keys) for _ in range(4)]
+CASTLING = []
+for _rights in range(ALL_CASTLING_RIGHTS + 1):
+    _key = 0
+    for _bit, _bit_key in enumerate(_castling_bits):
+        if _rights & (1 << _bit):
+            _key ^= _bit_key
+    CASTLING.append(_key)
+
+EN_PASSANT = dict((_file, next(_keys)) for _file in FILES)
+
+
+def piece_key(piece, file, rank):
+    return PIECES[(piece.SYMBOL, piece.color, file, rank)]
@@ -152,6 +152,44 @@ class CastlingTests(TestCase):
         self.board.set_piece(Rook, BLACK, 'b', 8)
         self.board.move_piece('e', 1, 'c', 1)
 
+    def test_cannot_castle_queen_side_if_knight_on_b1(self):
+        self.board.set_piece(Knight, WHITE, 'b', 1)
+        with self.assertRaises(MoveNotAllowed):
+            self.board.move_piece('e', 1, 'c', 1)
+
+    def test_cannot_castle_king_side_if_rook_has_moved(self):
+        self.board.move_piece('h', 1, 'h', 2)
+        self.board.move_piece('h', 2, 'h', 1)
+        with self.assertRaises(MoveNotAllowed):
+            self.board.move_piece('e', 1, 'g', 1)
+
+    def test_can_still_castle_queen_side_if_king_rook_has_moved(self):
+        self.board.move_piece('h', 1, 'h', 2)
+        self.board.move_piece('e', 1, 'c', 1)
+
+
+class BlackCastlingTests(TestCase):
+    def setUp(self):
+        super(BlackCastlingTests, self).setUp()
+        self.king = self.board.set_piece(King, BLACK, 'e', 8)
+        self.king_rook = self.board.set_piece(Rook, BLACK, 'h', 8)
+        self.queen_rook = self.board.set_piece(Rook, BLACK, 'a', 8)
+
+    def test_can_castle_king_side(self):
+        self.board.move_piece('e', 8, 'g', 8)
+        self.assertPieceOnSquare(King(self.board, BLACK, 'g', 8))
+        self.assertPieceOnSquare(Rook(self.board, BLACK, 'f', 8))
+
+    def test_can_castle_queen_side(self):
+        self.board.move_piece('e', 8, 'c', 8)
+        self.assertPieceOnSquare(King(self.board, BLACK, 'c', 8))
+        self.assertPieceOnSquare(Rook(self.board, BLACK, 'd', 8))
+
+    def test_cannot_castle_king_side_if_check_along_king_path(self):
+        self.board.set_piece(Rook, WHITE, 'f', 1)
+        with self.assertRaises(MoveNotAllowed):
+            self.board.move_piece('e', 8, 'g', 8)
+
 
 class CheckmateTests(TestCase):
     def setUp(self):
@@ -45,3 +45,10 @@ class KnightTests(TestCase):
         self.board.set_piece(Pawn, WHITE, 'f', 3)
         with self.assertRaises(MoveNotAllowed):
             self.board.move_piece('d', 4, 'f', 3)
+
+    def test_does_not_wrap_around_board(self):
+        knight = self.board.set_piece(Knight, WHITE, 'b', 1)
+        self.assertPieceDoesNotAttack(knight, 'h', 8)
+        self.assertPieceDoesNotAttack(knight, 'h', 2)
+        self.assertEqual({('a', 3), ('c', 3), ('d', 2)},
+                         knight.get_squares_this_piece_attacks())
@@ -103,3 +103,66 @@ class PawnTests(TestCase):
         self.board.set_piece(Pawn, BLACK, 'b', 2)
         self.board.move_piece('b', 2, 'b', 1)
         self.assertPieceOnSquare(Queen(self.board, BLACK, 'b', 1))
+
+    def test_underpromotion(self):
+        pawn = self.board.set_piece(Pawn, WHITE, 'a', 7)
+        self.board.move_piece('a', 7, 'a', 8, Knight)
+        self.assertPieceOnSquare(Knight(self.board, WHITE, 'a', 8))
+        self.assertIs(pawn, self.board['a'][8])
+
+    def test_disallow_promotion_to_pawn_or_king(self):
+        self.board.set_piece(Pawn, WHITE, 'a', 7)
+        for promotion in (Pawn, King):
+            with self.assertRaises(MoveNotAllowed):
+                self.board.move_piece('a', 7, 'a', 8, promotion)
+
+    def test_disallow_promotion_choice_for_other_moves(self):
+        self.board.set_piece(Pawn, WHITE, 'a', 2)
+        with self.assertRaises(MoveNotAllowed):
+            self.board.move_piece('a', 2, 'a', 3, Queen)
+
+    def test_disallow_move_diagonally_without_capture(self):
+        self.board.set_piece(Pawn, WHITE, 'b', 2)
+        with self.assertRaises(MoveNotAllowed):
+            self.board.move_piece('b', 2, 'c', 3)
+
+    def test_disallow_push_onto_own_piece(self):
+        self.board.set_piece(Pawn, WHITE, 'b', 2)
+        self.board.set_piece(Knight, WHITE, 'b', 3)
+        with self.assertRaises(MoveNotAllowed):
+            self.board.move_piece('b', 2, 'b', 3)
+
+    def test_disallow_two_square_push_off_starting_rank(self):
+        self.board.set_piece(Pawn, WHITE, 'b', 3)
+        with self.assertRaises(MoveNotAllowed):
+            self.board.move_piece('b', 3, 'b', 5)
+
+
+class EnPassantTests(TestCase):
+    def test_white_captures_en_passant(self):
+        self.board.set_piece(Pawn, WHITE, 'e', 5)
+        black_pawn = self.board.set_piece(Pawn, BLACK, 'd', 7)
+        self.board.move_piece('d', 7, 'd', 5)
+        self.board.move_piece('e', 5, 'd', 6)
+        self.assertPieceOnSquare(Pawn(self.board, WHITE, 'd', 6))
+        self.assertIsNone(self.board['d'][5])
+        self.assertEqual([black_pawn], self.board.captured_pieces[WHITE])
+
+    def test_black_captures_en_passant(self):
+        self.board.set_piece(Pawn, BLACK, 'd', 4)
+        self.board.set_piece(Pawn, WHITE, 'e', 2)
+        self.board.move_piece('e', 2, 'e', 4)
+        self.board.move_piece('d', 4, 'e', 3)
+        self.assertPieceOnSquare(Pawn(self.board, BLACK, 'e', 3))
+        self.assertIsNone(self.board['e'][4])
+
+    def test_en_passant_only_immediately_after_push(self):
+        self.board.set_piece(Pawn, WHITE, 'e', 5)
+        self.board.set_piece(Pawn, WHITE, 'a', 2)
+        self.board.set_piece(Pawn, BLACK, 'd', 7)
+        self.board.set_piece(Pawn, BLACK, 'h', 7)
+        self.board.move_piece('d', 7, 'd', 5)
+        self.board.move_piece('a', 2, 'a', 3)
+        self.board.move_piece('h', 7, 'h', 6)
+        with self.assertRaises(MoveNotAllowed):
+            self.board.move_piece('e', 5, 'd', 6)
@@ -1,4 +1,7 @@
+from botetourt import fen, tables
 from botetourt.board import Board, WHITE, BLACK
+from botetourt.consts import (ALL_CASTLING_RIGHTS, WHITE_KING_SIDE,
+                              BLACK_KING_SIDE)
 from botetourt.pieces import Bishop, King, Knight, Pawn, Queen, Rook
 from botetourt.exc import MoveNotAllowed
 
@@ -89,3 +92,274 @@ class BoardTests(TestCase):
         with self.assertRaises(MoveNotAllowed):
             self.board.move_piece('f', 1, 'h', 3)
 
+
+class MoveStateTests(TestCase):
+    def test_white_moves_first(self):
+        self.assertEqual(WHITE, self.board.turn)
+
+    def test_turn_passes_to_other_color(self):
+        self.board.set_piece(Pawn, WHITE, 'b', 2)
+        self.board.move_piece('b', 2, 'b', 3)
+        self.assertEqual(BLACK, self.board.turn)
+
+    def test_double_push_sets_en_passant_square(self):
+        self.board.set_piece(Pawn, WHITE, 'b', 2)
+        self.board.move_piece('b', 2, 'b', 4)
+        self.assertEqual(('b', 3), self.board.en_passant)
+
+    def test_en_passant_square_cleared_by_next_move(self):
+        self.board.set_piece(Pawn, WHITE, 'b', 2)
+        self.board.set_piece(Pawn, BLACK, 'g', 7)
+        self.board.move_piece('b', 2, 'b', 4)
+        self.board.move_piece('g', 7, 'g', 6)
+        self.assertIsNone(self.board.en_passant)
+
+    def test_rook_move_revokes_castling_right(self):
+        self.board.set_piece(Rook, WHITE, 'h', 1)
+        self.board.move_piece('h', 1, 'h', 2)
+        self.assertEqual(ALL_CASTLING_RIGHTS & ~WHITE_KING_SIDE,
+                         self.board.castling_rights)
+
+    def test_capturing_rook_revokes_castling_right(self):
+        self.board.set_piece(Rook, WHITE, 'h', 1)
+        self.board.set_piece(Rook, BLACK, 'h', 8)
+        self.board.move_piece('h', 1, 'h', 8)
+        self.assertEqual(ALL_CASTLING_RIGHTS & ~(WHITE_KING_SIDE | BLACK_KING_SIDE),
+                         self.board.castling_rights)
+
+
+class PositionHashTests(TestCase):
+    def test_same_position_same_hash(self):
+        self.board.set_piece(Knight, WHITE, 'b', 1)
+        self.board.set_piece(Knight, BLACK, 'b', 8)
+        initial_hash = self.board.hash
+
+        self.board.move_piece('b', 1, 'c', 3)
+        self.board.move_piece('b', 8, 'c', 6)
+        self.assertNotEqual(initial_hash, self.board.hash)
+
+        self.board.move_piece('c', 3, 'b', 1)
+        self.board.move_piece('c', 6, 'b', 8)
+        self.assertEqual(initial_hash, self.board.hash)
+
+    def test_side_to_move_changes_hash(self):
+        self.board.set_piece(Knight, WHITE, 'b', 1)
+        self.board.move_piece('b', 1, 'c', 3)
+        other_board = Board()
+        other_board.set_piece(Knight, WHITE, 'c', 3)
+        self.assertNotEqual(other_board.hash, self.board.hash)
+
+    def test_castling_rights_change_hash(self):
+        self.board.set_piece(Rook, WHITE, 'h', 1)
+        self.board.set_piece(Rook, BLACK, 'a', 8)
+        initial_hash = self.board.hash
+        self.board.move_piece('h', 1, 'h', 2)
+        self.board.move_piece('a', 8, 'a', 7)
+        self.board.move_piece('h', 2, 'h', 1)
+        self.board.move_piece('a', 7, 'a', 8)
+        self.assertNotEqual(initial_hash, self.board.hash)
+
+    def test_hash_is_incremental(self):
+        self.board.set_piece(Pawn, WHITE, 'b', 2)
+        self.board.set_piece(Rook, BLACK, 'c', 3)
+        self.board.move_piece('b', 2, 'c', 3)
+
+        other_board = Board()
+        other_board.set_piece(Pawn, WHITE, 'c', 3)
+        other_board._set_turn(BLACK)
+        self.assertEqual(other_board.hash, self.board.hash)
+
+    def test_transpositions_hash_the_same(self):
+        first = fen.loads(fen.STARTING_POSITION)
+        for move in [('e', 2, 'e', 4), ('e', 7, 'e', 5),
+                     ('g', 1, 'f', 3), ('b', 8, 'c', 6)]:
+            first.make_move(*move)
+        second = fen.loads(fen.STARTING_POSITION)
+        for move in [('g', 1, 'f', 3), ('b', 8, 'c', 6),
+                     ('e', 2, 'e', 4), ('e', 7, 'e', 5)]:
+            second.make_move(*move)
+        self.assertEqual('e6', fen.dumps(second).split()[3])
+        self.assertEqual(first.hash, second.hash)
+
+    def test_en_passant_hashed_when_capturable(self):
+        board = fen.loads('4k3/3p4/8/4P3/8/8/8/4K3 b - - 0 1')
+        board.make_move('d', 7, 'd', 5)
+        without = fen.loads('4k3/8/8/3pP3/8/8/8/4K3 w - - 0 2')
+        self.assertNotEqual(without.hash, board.hash)
+        self.assertEqual(fen.loads(fen.dumps(board)).hash, board.hash)
+
+        board.make_move('e', 5, 'd', 6)
+        board.unmake_move()
+        board.unmake_move()
+        self.assertEqual(fen.loads('4k3/3p4/8/4P3/8/8/8/4K3 b - - 0 1').hash,
+                         board.hash)
+
+    def test_snapshot_keeps_en_passant_hash(self):
+        board = fen.loads('4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 2')
+        clone = board.copy()
+        clone.make_move('e', 1, 'e', 2)
+        board.make_move('e', 1, 'e', 2)
+        self.assertEqual(board.hash, clone.hash)
+
+
+class MakeUnmakeTests(TestCase):
+    def assertUnmakeRestores(self, position, move):
+        board = fen.loads(position)
+        before_hash = board.hash
+        board.make_move(*move)
+        self.assertNotEqual(position, fen.dumps(board))
+        self.assertEqual(move, board.unmake_move())
+        self.assertEqual(position, fen.dumps(board))
+        self.assertEqual(before_hash, board.hash)
+        self.assertEqual([], board.history)
+        return board
+
+    def test_quiet_move(self):
+        self.assertUnmakeRestores(fen.STARTING_POSITION, ('g', 1, 'f', 3))
+
+    def test_capture(self):
+        board = self.assertUnmakeRestores(
+            '4k3/8/8/3r4/8/8/8/3QK3 w - - 0 1', ('d', 1, 'd', 5))
+        self.assertEqual([], board.captured_pieces[WHITE])
+        self.assertPieceOnSquare(Rook(board, BLACK, 'd', 5))
+        self.assertIs(board, board['d'][5].board)
+
+    def test_en_passant(self):
+        self.assertUnmakeRestores('4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1',
+                                  ('e', 5, 'd', 6))
+
+    def test_castling(self):
+        self.assertUnmakeRestores('r3k2r/8/8/8/8/8/8/R3K2R b KQkq - 0 1',
+                                  ('e', 8, 'c', 8))
+
+    def test_promotion(self):
+        board = self.assertUnmakeRestores('4k3/P7/8/8/8/8/8/4K3 w - - 0 1',
+                                          ('a', 7, 'a', 8))
+        self.assertPieceOnSquare(Pawn(board, WHITE, 'a', 7))
+
+    def test_underpromotion(self):
+        board = self.assertUnmakeRestores('1r2k3/P7/8/8/8/8/8/4K3 w - - 0 1',
+                                          ('a', 7, 'b', 8, Knight))
+        self.assertPieceOnSquare(Pawn(board, WHITE, 'a', 7))
+        self.assertPieceOnSquare(Rook(board, BLACK, 'b', 8))
+
+    def test_sequence(self):
+        board = fen.loads(fen.STARTING_POSITION)
+        moves = [('e', 2, 'e', 4), ('d', 7, 'd', 5), ('e', 4, 'd', 5)]
+        for move in moves:
+            board.make_move(*move)
+        for move in reversed(moves):
+            self.assertEqual(move, board.unmake_move())
+        self.assertEqual(fen.STARTING_POSITION, fen.dumps(board))
+
+    def test_illegal_move_not_recorded(self):
+        board = fen.loads(fen.STARTING_POSITION)
+        with self.assertRaises(MoveNotAllowed):
+            board.make_move('e', 2, 'e', 5)
+        self.assertEqual([], board.history)
+
+
+class CopyTests(TestCase):
+    POSITION = \
+        'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'
+
+    def test_copy_is_same_position(self):
+        board = fen.loads(self.POSITION)
+        clone = board.copy()
+        self.assertEqual(self.POSITION, fen.dumps(clone))
+        self.assertEqual(board.hash, clone.hash)
+        self.assertIs(clone, clone['e'][1].board)
+
+    def test_copies_are_independent(self):
+        board = fen.loads(self.POSITION)
+        clone = board.copy()
+        clone.move_piece('e', 1, 'g', 1)
+        self.assertEqual(self.POSITION, fen.dumps(board))
+        board.move_piece('a', 2, 'a', 3)
+        self.assertPieceOnSquare(King(clone, WHITE, 'g', 1))
+        self.assertPieceOnSquare(Pawn(clone, WHITE, 'a', 2))
+
+    def test_copy_is_lazy(self):
+        board = fen.loads(self.POSITION)
+        clones = [board.copy() for _ in range(100)]
+        for clone in clones:
+            self.assertNotIn('state', clone.__dict__)
+            self.assertIs(clones[0].snapshot().placement,
+                          clone.snapshot().placement)
+        clones[0]['a'][1]
+        self.assertIn('state', clones[0].__dict__)
+        self.assertIs(Board, type(clones[0]))
+
+    def test_clear_copy(self):
+        clone = fen.loads(self.POSITION).copy()
+        clone.clear()
+        self.assertIs(Board, type(clone))
+        self.assertEqual([], list(clone._get_pieces()))
+
+    def test_copy_of_copy(self):
+        clone = fen.loads(self.POSITION).copy().copy()
+        self.assertEqual(self.POSITION, fen.dumps(clone))
+
+    def test_snapshot_round_trip(self):
+        board = fen.loads(self.POSITION)
+        board.move_piece('e', 5, 'f', 7)
+        snapshot = board.snapshot()
+        self.assertEqual(fen.dumps(board),
+                         fen.dumps(Board.from_snapshot(snapshot)))
+        self.assertRaises(AttributeError, setattr, snapshot, 'turn', BLACK)
+
+    def test_copy_has_own_cache(self):
+        board = fen.load(Board(cache_size=16), self.POSITION)
+        clone = board.copy()
+        self.assertIsNot(board.cache, clone.cache)
+        self.assertEqual(16, clone.cache.maxsize)
+        self.assertIs(board.cache, board.copy(share_cache=True).cache)
+
+    def test_copy_keeps_captured_pieces(self):
+        board = fen.loads('4k3/8/8/3r4/8/8/8/3QK3 w - - 0 1')
+        board.move_piece('d', 1, 'd', 5)
+        clone = board.copy()
+        self.assertEqual(1, len(clone.captured_pieces[WHITE]))
+        clone.captured_pieces[WHITE].pop()
+        self.assertEqual(1, len(board.captured_pieces[WHITE]))
+
+
+class AttackQueryTests(TestCase):
+    POSITIONS = [
+        fen.STARTING_POSITION,
+        'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+        '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+        '8/5pk1/6p1/8/3Q4/8/5PPK/1q6 w - - 0 50',
+    ]
+
+    def test_attack_mask_matches_attacked_squares(self):
+        for position in self.POSITIONS:
+            board = fen.loads(position)
+            for piece in board._get_pieces():
+                self.assertEqual(
+                    sorted(piece.get_squares_this_piece_attacks()),
+                    sorted(tables.squares_in(board.attack_mask(piece))))
+
+    def test_mobility(self):
+        board = fen.loads(fen.STARTING_POSITION)
+        self.assertEqual(2, board.mobility(board['b'][1]))
+        self.assertEqual(0, board.mobility(board['a'][1]))
+        self.assertEqual(1, board.mobility(board['a'][2]))
+
+        board = fen.loads('4k3/8/8/3p4/8/8/8/3QK3 w - - 0 1')
+        # Up the file to the pawn, along the rank to the king and both
+        # diagonals
+        self.assertEqual(4 + 3 + 3 + 4, board.mobility(board['d'][1]))
+
+    def test_attackers_of(self):
+        for position in self.POSITIONS:
+            board = fen.loads(position)
+            for square in tables.SQUARES:
+                for color in (WHITE, BLACK):
+                    expected = sorted(
+                        (piece.file, piece.rank)
+                        for piece in board.get_pieces_by_color(color)
+                        if square in piece.get_squares_this_piece_attacks())
+                    mask = board.attackers_of(square, color)
+                    self.assertEqual(expected, tables.squares_in(mask))
+                    self.assertEqual(len(expected), tables.popcount(mask))
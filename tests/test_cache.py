@@ -0,0 +1,78 @@
+from botetourt.board import Board, WHITE, BLACK
+from botetourt.cache import PositionCache
+from botetourt.pieces import Knight, Pawn, Rook
+
+from tests import TestCase
+
+
+class PositionCacheTests(TestCase):
+    def test_repeated_calls_hit_cache(self):
+        rook = self.board.set_piece(Rook, WHITE, 'a', 1)
+        moves = rook.get_legal_moves()
+        hits = self.board.cache.hits
+        self.assertEqual(moves, rook.get_legal_moves())
+        self.assertEqual(hits + 1, self.board.cache.hits)
+
+    def test_move_piece_invalidates(self):
+        rook = self.board.set_piece(Rook, WHITE, 'a', 1)
+        self.board.set_piece(Pawn, BLACK, 'h', 7)
+        self.assertIn(('a', 8), rook.get_legal_moves())
+        self.board.move_piece('h', 7, 'h', 6)
+        self.board.move_piece('a', 1, 'b', 1)
+        self.assertNotIn(('a', 8), rook.get_legal_moves())
+        self.assertIn(('b', 8), rook.get_legal_moves())
+
+    def test_set_piece_invalidates(self):
+        rook = self.board.set_piece(Rook, WHITE, 'a', 1)
+        self.assertIn(('a', 8), rook.get_legal_moves())
+        self.board.set_piece(Pawn, WHITE, 'a', 4)
+        self.assertNotIn(('a', 8), rook.get_legal_moves())
+
+    def test_remove_piece_invalidates(self):
+        rook = self.board.set_piece(Rook, WHITE, 'a', 1)
+        self.board.set_piece(Pawn, WHITE, 'a', 4)
+        self.assertEqual({('a', 4)}, self.board.occupied_squares(WHITE) -
+                         {('a', 1)})
+        self.board.remove_piece('a', 4)
+        self.assertEqual({('a', 1)}, self.board.occupied_squares(WHITE))
+        self.assertIn(('a', 8), rook.get_legal_moves())
+
+    def test_transposition_reuses_entries(self):
+        knight = self.board.set_piece(Knight, WHITE, 'b', 1)
+        self.board.set_piece(Knight, BLACK, 'b', 8)
+        knight.get_legal_moves()
+        for move in (('b', 1, 'c', 3), ('b', 8, 'c', 6),
+                     ('c', 3, 'b', 1), ('c', 6, 'b', 8)):
+            self.board.move_piece(*move)
+        hits = self.board.cache.hits
+        knight.get_legal_moves()
+        self.assertEqual(hits + 1, self.board.cache.hits)
+
+    def test_results_are_immutable(self):
+        self.board.set_piece(Rook, WHITE, 'a', 1)
+        with self.assertRaises(AttributeError):
+            self.board.attacked_squares(BLACK).add(('h', 8))
+
+    def test_bounded(self):
+        board = Board(cache_size=2)
+        rook = board.set_piece(Rook, WHITE, 'a', 1)
+        board.set_piece(Rook, BLACK, 'h', 8)
+        rook.get_legal_moves()
+        self.assertEqual(2, len(board.cache))
+
+    def test_disabled(self):
+        board = Board(cache_size=0)
+        rook = board.set_piece(Rook, WHITE, 'a', 1)
+        rook.get_legal_moves()
+        rook.get_legal_moves()
+        self.assertEqual(0, len(board.cache))
+        self.assertEqual(0, board.cache.hits)
+
+    def test_lru_eviction(self):
+        cache = PositionCache(maxsize=2)
+        cache.get(1, 'a', lambda: 'a')
+        cache.get(1, 'b', lambda: 'b')
+        cache.get(1, 'a', lambda: 'stale')
+        cache.get(1, 'c', lambda: 'c')
+        self.assertEqual('a', cache.get(1, 'a', lambda: 'new'))
+        self.assertEqual('new', cache.get(1, 'b', lambda: 'new'))
@@ -0,0 +1,95 @@
+from botetourt import fen
+from botetourt.board import WHITE, BLACK
+from botetourt.exc import MoveNotAllowed
+from botetourt.pieces import Bishop, King, Knight, Pawn, Rook
+
+from tests import TestCase
+
+
+class KingSafetyTests(TestCase):
+    def setUp(self):
+        super(KingSafetyTests, self).setUp()
+        self.king = self.board.set_piece(King, WHITE, 'e', 1)
+
+    def test_no_king(self):
+        board = fen.loads('8/8/8/8/8/8/8/R7 w - - 0 1')
+        self.assertFalse(board.king_safety(WHITE).in_check)
+
+    def test_single_check_ray(self):
+        self.board.set_piece(Rook, BLACK, 'e', 5)
+        safety = self.board.king_safety(WHITE)
+        self.assertEqual((('e', 5),), safety.checkers)
+        self.assertEqual({('e', 2), ('e', 3), ('e', 4), ('e', 5)},
+                         safety.check_ray)
+
+    def test_double_check(self):
+        self.board.set_piece(Rook, BLACK, 'e', 8)
+        self.board.set_piece(Knight, BLACK, 'd', 3)
+        rook = self.board.set_piece(Rook, WHITE, 'a', 3)
+        self.assertEqual(2, len(self.board.king_safety(WHITE).checkers))
+        # Neither checker can be captured or blocked, only the king can move
+        self.assertEqual(set(), rook.get_legal_moves())
+        self.assertTrue(self.king.get_legal_moves())
+
+    def test_pawn_check(self):
+        self.board.set_piece(Pawn, BLACK, 'd', 2)
+        self.assertEqual((('d', 2),), self.board.king_safety(WHITE).checkers)
+        self.board.set_piece(Pawn, BLACK, 'e', 2)
+        self.board.remove_piece('d', 2)
+        self.assertFalse(self.board.king_safety(WHITE).in_check)
+
+    def test_must_block_or_capture_checker(self):
+        self.board.set_piece(Rook, BLACK, 'e', 5)
+        rook = self.board.set_piece(Rook, WHITE, 'a', 3)
+        self.assertEqual({('e', 3)}, rook.get_legal_moves())
+        knight = self.board.set_piece(Knight, WHITE, 'd', 3)
+        self.assertEqual({('e', 5)}, knight.get_legal_moves())
+
+    def test_pinned_piece_stays_on_line(self):
+        self.board.set_piece(Rook, BLACK, 'e', 8)
+        rook = self.board.set_piece(Rook, WHITE, 'e', 4)
+        self.assertEqual({('e', 2), ('e', 3), ('e', 5), ('e', 6), ('e', 7),
+                          ('e', 8)}, rook.get_legal_moves())
+        with self.assertRaises(MoveNotAllowed):
+            self.board.move_piece('e', 4, 'a', 4)
+
+    def test_pinned_knight_cannot_move(self):
+        self.board.set_piece(Bishop, BLACK, 'a', 5)
+        knight = self.board.set_piece(Knight, WHITE, 'd', 2)
+        self.assertEqual(set(), knight.get_legal_moves())
+
+    def test_two_pieces_in_front_not_pinned(self):
+        self.board.set_piece(Rook, BLACK, 'e', 8)
+        self.board.set_piece(Pawn, WHITE, 'e', 2)
+        knight = self.board.set_piece(Knight, WHITE, 'e', 4)
+        self.assertEqual({}, self.board.king_safety(WHITE).pins)
+        self.assertTrue(knight.get_legal_moves())
+
+    def test_king_cannot_step_back_along_check(self):
+        self.board.set_piece(Rook, BLACK, 'a', 1)
+        self.assertNotIn(('f', 1), self.king.get_legal_moves())
+        self.assertIn(('e', 2), self.king.get_legal_moves())
+
+    def test_king_cannot_capture_knight_defended_piece(self):
+        self.board.set_piece(Rook, BLACK, 'e', 2)
+        self.board.set_piece(Knight, BLACK, 'c', 3)
+        self.assertNotIn(('e', 2), self.king.get_legal_moves())
+
+    def test_en_passant_exposing_king_along_rank(self):
+        board = fen.loads('8/8/8/KPp4r/8/8/8/7k w - c6 0 2')
+        self.assertNotIn(('c', 6), board['b'][5].get_legal_moves())
+
+    def test_en_passant_captures_checking_pawn(self):
+        board = fen.loads('8/8/8/3k4/2Pp4/8/8/4K3 b - c3 0 1')
+        self.assertEqual((('c', 4),), board.king_safety(BLACK).checkers)
+        self.assertEqual({('c', 3)}, board['d'][4].get_legal_moves())
+
+
+class CheckmateWithPinsTests(TestCase):
+    def test_pinned_piece_cannot_interpose(self):
+        board = fen.loads('b6k/8/8/3R4/8/6Pp/7P/r6K w - - 0 1')
+        self.assertTrue(board['h'][1].is_checkmated())
+
+    def test_unpinned_piece_can_interpose(self):
+        board = fen.loads('7k/8/8/3R4/8/6Pp/7P/r6K w - - 0 1')
+        self.assertFalse(board['h'][1].is_checkmated())
@@ -0,0 +1,65 @@
+from botetourt import fen
+from botetourt.board import WHITE, BLACK
+from botetourt.consts import ALL_CASTLING_RIGHTS, WHITE_KING_SIDE
+from botetourt.exc import InvalidFEN
+from botetourt.pieces import King, Pawn, Rook
+
+from tests import TestCase
+
+
+KIWIPETE = \
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'
+
+
+class FENTests(TestCase):
+    def test_starting_position(self):
+        board = fen.loads(fen.STARTING_POSITION)
+        self.assertPieceOnSquare(King(board, WHITE, 'e', 1))
+        self.assertPieceOnSquare(Rook(board, BLACK, 'h', 8))
+        self.assertPieceOnSquare(Pawn(board, BLACK, 'a', 7))
+        self.assertEqual(WHITE, board.turn)
+        self.assertEqual(ALL_CASTLING_RIGHTS, board.castling_rights)
+
+    def test_setup_pieces_matches_starting_position(self):
+        self.board.setup_pieces()
+        self.assertEqual(fen.STARTING_POSITION, fen.dumps(self.board))
+        self.assertEqual(fen.loads(fen.STARTING_POSITION).hash,
+                         self.board.hash)
+
+    def test_round_trip(self):
+        for position in (fen.STARTING_POSITION, KIWIPETE,
+                         '8/8/8/4k3/3pP3/8/8/4K3 b - e3 0 41'):
+            self.assertEqual(position, fen.dumps(fen.loads(position)))
+
+    def test_move_state(self):
+        board = fen.loads('4k3/8/8/3pP3/8/8/8/4K2R w K d6 3 30')
+        self.assertEqual(WHITE, board.turn)
+        self.assertEqual(WHITE_KING_SIDE, board.castling_rights)
+        self.assertEqual(('d', 6), board.en_passant)
+        self.assertEqual(3, board.halfmove_clock)
+        self.assertEqual(30, board.fullmove_number)
+        board.move_piece('e', 5, 'd', 6)
+        self.assertIsNone(board['d'][5])
+
+    def test_hash_matches_played_position(self):
+        self.board.setup_pieces()
+        self.board.move_piece('e', 2, 'e', 4)
+        expected = fen.loads(
+            'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1')
+        self.assertEqual(expected.hash, self.board.hash)
+        self.assertEqual(fen.dumps(expected), fen.dumps(self.board))
+
+    def test_missing_move_counters(self):
+        board = fen.loads('4k3/8/8/8/8/8/8/4K3 b - -')
+        self.assertEqual(BLACK, board.turn)
+        self.assertEqual(1, board.fullmove_number)
+
+    def test_invalid(self):
+        for position in ('', '8/8/8 w - - 0 1',
+                         '4k3/8/8/8/8/8/8/4K3 x - - 0 1',
+                         '4k3/8/8/8/8/8/8/4K4 w - - 0 1',
+                         '4k3/8/8/8/8/8/8/4X3 w - - 0 1',
+                         '4k3/8/8/8/8/8/8/4K3 w Z - 0 1',
+                         '4k3/8/8/8/8/8/8/4K3 w - z9 0 1'):
+            with self.assertRaises(InvalidFEN):
+                fen.loads(position)
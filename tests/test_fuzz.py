@@ -0,0 +1,42 @@
+from benchmarks import fuzz
+from botetourt import fen
+
+from tests import TestCase
+
+
+def without_knight_moves(position):
+    summary = fuzz.reference(position)
+    board = fen.loads(position)
+    moves = frozenset(move for move in summary.moves
+                      if board[move[0]][move[1]].SYMBOL != 'N')
+    return summary._replace(moves=moves)
+
+
+class FuzzTests(TestCase):
+    def setUp(self):
+        super(FuzzTests, self).setUp()
+        fuzz.BACKENDS['broken'] = without_knight_moves
+        self.addCleanup(fuzz.BACKENDS.pop, 'broken')
+
+    def test_backends_agree(self):
+        positions, mismatches, _ = fuzz.run(sorted(fuzz.BACKENDS), games=2,
+                                            max_plies=4, processes=1)
+        self.assertEqual(10, positions)
+        self.assertTrue(mismatches)
+        self.assertEqual({'broken'},
+                         {mismatch.backend for mismatch in mismatches})
+
+    def test_shrinks_to_minimal_position(self):
+        mismatch = fuzz.play_game(['broken'], seed=0, max_plies=0)[1][0]
+        self.assertEqual(fen.STARTING_POSITION, mismatch.fen)
+        self.assertEqual(['b1a3', 'b1c3', 'g1f3', 'g1h3'],
+                         mismatch.differences['missing'])
+        self.assertEqual('4k3/8/8/8/8/8/8/4K1N1 w - - 0 1', mismatch.shrunk)
+
+    def test_compare(self):
+        summary = fuzz.reference(fen.STARTING_POSITION)
+        other = summary._replace(in_check=True, hash=0)
+        self.assertEqual({'in_check': (False, True),
+                          'hash': (summary.hash, 0)},
+                         fuzz.compare(summary, other))
+        self.assertEqual({}, fuzz.compare(summary, summary))
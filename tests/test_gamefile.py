@@ -0,0 +1,108 @@
+from StringIO import StringIO
+
+from botetourt import fen, gamefile, pgn
+from botetourt.exc import MoveNotAllowed
+from botetourt.pieces import Knight
+
+from tests import TestCase
+from tests.test_pgn import OPERA_GAME, CASTLING_GAME
+
+
+PROMOTION_GAME = """[Event "Promotion"]
+[FEN "4k3/1P6/8/3pP3/8/8/8/4K3 w - d6 0 1"]
+[Result "*"]
+
+1. exd6 Kd7 2. b8=N+ Kxd6 3. Nc6 *
+"""
+
+
+class GameFileTests(TestCase):
+    def convert(self, text, coder=gamefile.PACKED):
+        f = StringIO()
+        written, failed = gamefile.convert(StringIO(text), f, coder=coder)
+        return written, failed, f.getvalue()
+
+    def assertRoundTrip(self, text, coder):
+        written, failed, data = self.convert(text, coder=coder)
+        sources = list(pgn.read_games(StringIO(text)))
+        self.assertEqual((len(sources), 0), (written, failed))
+
+        games = list(gamefile.read_games(StringIO(data)))
+        self.assertEqual(len(sources), len(games))
+        for source, game in zip(sources, games):
+            self.assertEqual(source.headers, game.headers)
+            self.assertEqual(source.result, game.result)
+
+            expected = source.new_board()
+            moves = list(pgn.replay(expected, source.moves))
+            board = game.new_board()
+            self.assertEqual([move[:4] for move in moves],
+                             [move[:4] for move in game.replay(board)])
+            self.assertEqual(fen.dumps(expected), fen.dumps(board))
+
+    def test_round_trip(self):
+        games = OPERA_GAME + '\n' + CASTLING_GAME + '\n' + PROMOTION_GAME
+        for coder in (gamefile.RAW, gamefile.PACKED):
+            self.assertRoundTrip(games, coder)
+
+    def test_underpromotion(self):
+        game = list(gamefile.read_games(StringIO(
+            self.convert(PROMOTION_GAME)[2])))[0]
+        self.assertEqual(('b', 7, 'b', 8, Knight), list(game.replay())[2])
+
+    def test_smaller_than_pgn(self):
+        source = list(pgn.read_games(StringIO(OPERA_GAME)))[0]
+        movetext = OPERA_GAME.split('\n\n', 1)[1]
+        raw = list(gamefile.read_games(StringIO(
+            self.convert(OPERA_GAME, coder=gamefile.RAW)[2])))[0]
+        packed = list(gamefile.read_games(StringIO(
+            self.convert(OPERA_GAME)[2])))[0]
+        self.assertEqual(2 * len(source.moves), len(raw.payload))
+        self.assertTrue(len(packed.payload) < len(source.moves))
+        self.assertTrue(len(packed.payload) * 5 < len(movetext))
+
+    def test_offsets(self):
+        data = self.convert(OPERA_GAME + '\n' + CASTLING_GAME)[2]
+        for game in gamefile.read_games(StringIO(data)):
+            other = list(gamefile.read_games(StringIO(
+                gamefile.MAGIC + data[game.offset:])))[0]
+            self.assertEqual(game.headers, other.headers)
+
+    def test_illegal_move_is_not_written(self):
+        f = StringIO()
+        with gamefile.GameFileWriter(f) as writer:
+            board = fen.loads(fen.STARTING_POSITION)
+            with self.assertRaises(MoveNotAllowed):
+                writer.write_game(board, [('e', 2, 'e', 4), ('e', 4, 'e', 5)])
+        self.assertEqual(gamefile.MAGIC, f.getvalue())
+        self.assertEqual(fen.STARTING_POSITION, fen.dumps(board))
+        self.assertEqual([], board.history)
+
+    def test_corrupt_record(self):
+        for coder, num_moves, payload in [
+                # Piece and move indexes out of range
+                (gamefile.RAW, 1, '\x63\x00'),
+                (gamefile.RAW, 1, '\x08\x63'),
+                (gamefile.RAW, 1, '\x00'),
+                # The first piece, the rook on a1, has no legal moves
+                (gamefile.PACKED, 1, ''),
+                # Digits left over after the last move
+                (gamefile.PACKED, 0, '\x01')]:
+            game = gamefile.StoredGame({}, '*', coder, num_moves, payload)
+            with self.assertRaises(ValueError):
+                list(game.replay())
+
+    def test_convert_counts_failures(self):
+        written, failed, data = self.convert(
+            '[Event "Bad"]\n\n1. e4 e4 *\n\n' + CASTLING_GAME)
+        self.assertEqual((1, 1), (written, failed))
+        self.assertEqual(1, len(list(gamefile.read_games(StringIO(data)))))
+
+    def test_not_a_game_file(self):
+        with self.assertRaises(ValueError):
+            list(gamefile.read_games(StringIO('BTPIDX01')))
+
+    def test_truncated(self):
+        data = self.convert(OPERA_GAME)[2]
+        with self.assertRaises(ValueError):
+            list(gamefile.read_games(StringIO(data[:-5])))
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+from StringIO import StringIO
+
+from botetourt import fen
+from botetourt.index import (MAGIC, RECORD, IndexBuilder, PositionIndex,
+                             build_index)
+
+from tests import TestCase
+
+
+GAMES = """[Event "One"]
+
+1. e4 e5 2. Nf3 Nc6 3. Ng1 Nb8 4. Nf3 *
+
+[Event "Two"]
+
+1. e4 e5 2. Nf3 Nf6 *
+
+[Event "Three"]
+
+1. e4 e5 2. Ke3 *
+"""
+
+
+class PositionIndexTests(TestCase):
+    def setUp(self):
+        super(PositionIndexTests, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'positions.idx')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        super(PositionIndexTests, self).tearDown()
+
+    def build(self, run_size=1000):
+        return build_index(StringIO(GAMES), self.path, run_size=run_size)
+
+    def hash_of(self, position):
+        return fen.loads(position).hash
+
+    def test_lookup(self):
+        self.assertEqual((2, 1), self.build())
+        offsets = [GAMES.index('[Event "%s"]' % name)
+                   for name in ('One', 'Two', 'Three')]
+
+        # No pawn can capture en passant, so the e6 square isn't part of
+        # the hash
+        after_e5 = self.hash_of(
+            'rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2')
+        after_nf6 = self.hash_of(
+            'rnbqkb1r/pppp1ppp/5n2/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3')
+
+        with PositionIndex(self.path) as index:
+            self.assertEqual(offsets, index.lookup(after_e5))
+            self.assertEqual([offsets[1]], index.lookup(after_nf6))
+            self.assertEqual([], index.lookup(0))
+
+    def test_repeated_positions_indexed_once(self):
+        self.build()
+        after_nf3 = self.hash_of(
+            'rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2')
+        with PositionIndex(self.path) as index:
+            self.assertEqual([0, GAMES.index('[Event "Two"]')],
+                             index.lookup(after_nf3))
+
+    def test_finds_transpositions(self):
+        games = GAMES + """
+[Event "Four"]
+
+1. Nf3 Nc6 2. e4 e5 *
+"""
+        build_index(StringIO(games), self.path)
+        position = self.hash_of('r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/'
+                                'RNBQKB1R w KQkq - 2 3')
+        with PositionIndex(self.path) as index:
+            self.assertEqual([0, games.index('[Event "Four"]')],
+                             index.lookup(position))
+
+    def test_merges_runs(self):
+        self.build(run_size=1000)
+        with PositionIndex(self.path) as index:
+            expected = [(h, index.lookup(h)) for h in self._all_hashes()]
+        self.build(run_size=3)
+        with PositionIndex(self.path) as index:
+            self.assertEqual(expected,
+                             [(h, index.lookup(h)) for h in self._all_hashes()])
+        self.assertEqual(['positions.idx'], os.listdir(self.tmpdir))
+
+    def _all_hashes(self):
+        with open(self.path, 'rb') as f:
+            data = f.read()[len(MAGIC):]
+        return sorted({RECORD.unpack_from(data, i)[0]
+                       for i in range(0, len(data), RECORD.size)})
+
+    def test_empty(self):
+        IndexBuilder(self.path).finish()
+        with PositionIndex(self.path) as index:
+            self.assertEqual(0, len(index))
+            self.assertEqual([], index.lookup(123))
+
+    def test_not_an_index(self):
+        with open(self.path, 'wb') as f:
+            f.write('garbage!')
+        with self.assertRaises(ValueError):
+            PositionIndex(self.path)
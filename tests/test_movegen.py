@@ -0,0 +1,122 @@
+from botetourt import fen, movegen, profiling
+from botetourt.board import Board
+from botetourt.pieces import Bishop, Knight, Pawn, Queen, Rook
+
+from tests import TestCase
+
+
+class StagedMovesTests(TestCase):
+    def setUp(self):
+        super(StagedMovesTests, self).setUp()
+        # The white pawn, knight and queen can all take the rook on d5, and
+        # the pawn can also take the knight on f5
+        self.board = fen.load(Board(cache_size=0),
+                              '4k3/8/8/3r1n2/4P3/2N5/8/3QK3 w - - 0 1')
+
+    def all_legal_moves(self):
+        moves = set()
+        for piece in self.board.get_pieces_by_color(self.board.turn):
+            for new_file, new_rank in piece.get_legal_moves():
+                moves.add((piece.file, piece.rank, new_file, new_rank))
+        return moves
+
+    def test_yields_every_legal_move_once(self):
+        moves = [move for _, move in movegen.staged_moves(self.board)]
+        self.assertEqual(len(moves), len(set(moves)))
+        self.assertEqual(self.all_legal_moves(), set(moves))
+
+    def test_captures_ordered_mvv_lva(self):
+        captures = movegen.generate_captures(self.board)
+        self.assertEqual([('e', 4, 'd', 5), ('c', 3, 'd', 5),
+                          ('d', 1, 'd', 5), ('e', 4, 'f', 5)], captures)
+
+    def test_stage_order(self):
+        hash_move = ('e', 1, 'f', 2)
+        killer = ('c', 3, 'b', 5)
+        staged = list(movegen.staged_moves(self.board, hash_move=hash_move,
+                                           killers=[killer]))
+        self.assertEqual((movegen.HASH_MOVE, hash_move), staged[0])
+        self.assertEqual([movegen.CAPTURES] * 4,
+                         [stage for stage, _ in staged[1:5]])
+        self.assertEqual((movegen.KILLERS, killer), staged[5])
+        self.assertEqual({movegen.QUIETS},
+                         {stage for stage, _ in staged[6:]})
+
+    def test_illegal_hash_move_and_killers_skipped(self):
+        staged = list(movegen.staged_moves(
+            self.board, hash_move=('e', 1, 'e', 3),
+            killers=[('d', 1, 'd', 5), ('c', 3, 'c', 4)]))
+        self.assertEqual(movegen.CAPTURES, staged[0][0])
+        self.assertNotIn(movegen.KILLERS, [stage for stage, _ in staged])
+
+    def test_quiet_moves_generated_lazily(self):
+        with profiling.profile() as stats:
+            moves = movegen.staged_moves(self.board)
+            self.assertEqual(movegen.CAPTURES, next(moves)[0])
+        self.assertEqual(0, stats.counters['Piece.get_legal_moves'].calls)
+        self.assertEqual(0, stats.counters['Pawn.get_legal_moves'].calls)
+
+    def test_en_passant_is_capture(self):
+        board = fen.loads('4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1')
+        self.assertEqual([('e', 5, 'd', 6)], movegen.generate_captures(board))
+        self.assertNotIn(('e', 5, 'd', 6), movegen.generate_quiets(board))
+
+    def test_black_to_move(self):
+        board = fen.loads('4k3/8/8/3r4/4P3/8/8/4K3 b - - 0 1')
+        self.assertEqual([], movegen.generate_captures(board))
+        moves = movegen.generate_quiets(board)
+        self.assertIn(('d', 5, 'd', 1), moves)
+        self.assertNotIn(('e', 1, 'e', 2), moves)
+
+    def test_promotion_choices(self):
+        board = fen.loads('1r2k3/P7/8/8/8/8/8/4K3 w - - 0 1')
+        self.assertEqual([('a', 7, 'b', 8, Queen), ('a', 7, 'b', 8, Rook),
+                          ('a', 7, 'b', 8, Bishop), ('a', 7, 'b', 8, Knight)],
+                         movegen.generate_captures(board))
+        for promotion in (Queen, Rook, Bishop, Knight):
+            self.assertIn(('a', 7, 'a', 8, promotion),
+                          movegen.generate_quiets(board))
+        self.assertFalse(movegen.is_legal(board, ('a', 7, 'a', 8)))
+        self.assertFalse(movegen.is_legal(board, ('a', 7, 'a', 8, Pawn)))
+
+    def test_format_promotion(self):
+        move = ('a', 7, 'a', 8, Knight)
+        self.assertEqual('a7a8n', movegen.format_move(move))
+        self.assertEqual(move, movegen.parse_move('a7a8n'))
+
+
+def perft(board, depth):
+    if depth == 0:
+        return 1
+    nodes = 0
+    for _, move in movegen.staged_moves(board):
+        board.make_move(*move)
+        nodes += perft(board, depth - 1)
+        board.unmake_move()
+    return nodes
+
+
+class PerftTests(TestCase):
+    """Move counts from well-known positions, see
+    https://www.chessprogramming.org/Perft_Results
+    """
+    def assertPerft(self, position, depth, expected):
+        board = fen.loads(position)
+        self.assertEqual(expected, perft(board, depth))
+        self.assertEqual(position, fen.dumps(board))
+
+    def test_starting_position(self):
+        self.assertPerft(fen.STARTING_POSITION, 2, 400)
+
+    def test_kiwipete(self):
+        self.assertPerft('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/'
+                         'R3K2R w KQkq - 0 1', 1, 48)
+
+    def test_pins_and_en_passant(self):
+        self.assertPerft('8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', 3, 2812)
+
+    def test_promotions(self):
+        self.assertPerft('r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/'
+                         'R2Q1RK1 w kq - 0 1', 2, 264)
+        self.assertPerft('rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/'
+                         'RNBQK2R w KQ - 1 8', 1, 44)
@@ -0,0 +1,101 @@
+from StringIO import StringIO
+
+from botetourt import fen, pgn
+from botetourt.board import WHITE, BLACK
+from botetourt.exc import InvalidPGN, MoveNotAllowed
+from botetourt.pieces import King, Knight, Rook
+
+from tests import TestCase
+
+
+OPERA_GAME = """[Event "Paris"]
+[White "Paul Morphy"]
+[Black "Duke Karl / Count Isouard"]
+[Result "1-0"]
+
+1.e4 e5 2.Nf3 d6 3.d4 Bg4 {This is a weak move} 4.dxe5 Bxf3 5.Qxf3 dxe5
+6.Bc4 Nf6 7.Qb3 Qe7 8.Nc3 c6 9.Bg5 b5 (9...Qb4 10.Qxb4) 10.Nxb5 cxb5
+11.Bxb5+ Nbd7 12.O-O-O Rd8 13.Rxd7 Rxd7 14.Rd1 Qe6 15.Bxd7+ Nxd7 16.Qb8+
+Nxb8 17.Rd8# 1-0
+"""
+
+CASTLING_GAME = """[Event "Example"]
+[Result "*"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 4. Ba4 Nf6 5. O-O Be7 6. Re1 b5 7. Bb3 d6
+8. c3 O-O $1 9. h3 *
+"""
+
+
+class PGNTests(TestCase):
+    def test_read_games(self):
+        games = list(pgn.read_games(StringIO(OPERA_GAME + '\n' + CASTLING_GAME)))
+        self.assertEqual(2, len(games))
+        opera, castling = games
+        self.assertEqual('Paul Morphy', opera.headers['White'])
+        self.assertEqual('1-0', opera.result)
+        self.assertEqual(33, len(opera.moves))
+        self.assertEqual('Bg4', opera.moves[5])
+        self.assertEqual('Nxb5', opera.moves[18])
+        self.assertEqual('*', castling.result)
+        self.assertEqual(0, opera.offset)
+        self.assertEqual(len(OPERA_GAME) + 1, castling.offset)
+
+    def test_replay(self):
+        game = next(pgn.read_games(StringIO(OPERA_GAME)))
+        board = game.new_board()
+        moves = list(pgn.replay(board, game.moves))
+        self.assertEqual(('e', 2, 'e', 4), moves[0])
+        self.assertPieceOnSquare(Rook(board, WHITE, 'd', 8))
+        self.assertPieceOnSquare(King(board, BLACK, 'e', 8))
+        self.assertTrue(board['e'][8].is_checkmated())
+
+    def test_castling(self):
+        game = next(pgn.read_games(StringIO(CASTLING_GAME)))
+        board = game.new_board()
+        list(pgn.replay(board, game.moves))
+        self.assertEqual(
+            'r1bq1rk1/2p1bppp/p1np1n2/1p2p3/4P3/1BP2N1P/PP1P1PP1/RNBQR1K1 '
+            'b - - 0 9', fen.dumps(board))
+
+    def test_disambiguation(self):
+        board = fen.loads('4k3/8/8/8/8/8/8/1N2KN2 w - - 0 1')
+        with self.assertRaises(InvalidPGN):
+            pgn.play(board, 'Nd2')
+        pgn.play(board, 'Nbd2')
+        self.assertPieceOnSquare(Knight(board, WHITE, 'd', 2))
+
+    def test_underpromotion(self):
+        board = fen.loads('4k3/P7/8/8/8/8/8/4K3 w - - 0 1')
+        self.assertEqual(('a', 7, 'a', 8, Knight), pgn.play(board, 'a8=N'))
+        self.assertPieceOnSquare(Knight(board, WHITE, 'a', 8))
+
+    def test_san_round_trip(self):
+        game = list(pgn.read_games(StringIO(OPERA_GAME)))[0]
+        board = game.new_board()
+        for san in game.moves:
+            file, rank, new_file, new_rank, _ = pgn.parse_san(board, san)
+            self.assertEqual(san, pgn.san(board, (file, rank, new_file,
+                                                  new_rank)))
+            board.move_piece(file, rank, new_file, new_rank)
+
+    def test_san_disambiguation(self):
+        board = fen.loads('4k3/8/8/8/8/8/8/1N2KN2 w - - 0 1')
+        self.assertEqual('Nbd2', pgn.san(board, ('b', 1, 'd', 2)))
+        board = fen.loads('4k3/8/8/8/R7/8/8/R3K3 w - - 0 1')
+        self.assertEqual('R1a2', pgn.san(board, ('a', 1, 'a', 2)))
+
+    def test_san_promotion(self):
+        board = fen.loads('1r2k3/P7/8/8/8/8/8/4K3 w - - 0 1')
+        self.assertEqual('axb8=N', pgn.san(board, ('a', 7, 'b', 8, Knight)))
+        self.assertEqual('a8=Q', pgn.san(board, ('a', 7, 'a', 8)))
+
+    def test_illegal_move(self):
+        board = fen.loads(fen.STARTING_POSITION)
+        with self.assertRaises(MoveNotAllowed):
+            pgn.play(board, 'e5')
+
+    def test_invalid_move(self):
+        board = fen.loads(fen.STARTING_POSITION)
+        with self.assertRaises(InvalidPGN):
+            pgn.play(board, 'Zz9')
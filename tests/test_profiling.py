@@ -0,0 +1,50 @@
+from botetourt.board import WHITE, BLACK
+from botetourt.pieces import King, Knight, Pawn, Rook
+from botetourt import profiling
+
+from tests import TestCase
+
+
+class ProfilingTests(TestCase):
+    def test_counts_hot_paths(self):
+        king = self.board.set_piece(King, WHITE, 'a', 1)
+        self.board.set_piece(Rook, BLACK, 'a', 8)
+        self.board.set_piece(Rook, BLACK, 'b', 8)
+        with profiling.profile() as stats:
+            king.is_checkmated()
+
+        totals = stats.by_category()
+        for category in ('attack_vectors', 'attacked_squares', 'legal_moves',
+                         'check_detection'):
+            calls, seconds = totals[category]
+            self.assertTrue(calls > 0, category)
+            self.assertTrue(seconds >= 0.0, category)
+
+        self.assertEqual(1, stats.counters['King.is_checkmated'].calls)
+        # Checks and pins are analyzed once per position
+        self.assertTrue(stats.counters['Board.king_safety'].calls > 0)
+
+    def test_hooks_removed_on_exit(self):
+        original = King.__dict__['get_legal_moves']
+        with profiling.profile():
+            self.assertIsNot(original, King.__dict__['get_legal_moves'])
+        self.assertIs(original, King.__dict__['get_legal_moves'])
+
+    def test_no_counting_outside_block(self):
+        pawn = self.board.set_piece(Pawn, WHITE, 'b', 2)
+        with profiling.profile() as stats:
+            pass
+        pawn.get_legal_moves()
+        self.assertEqual(0, stats.counters['Pawn.get_legal_moves'].calls)
+
+    def test_cannot_nest(self):
+        with profiling.profile():
+            with self.assertRaises(RuntimeError):
+                with profiling.profile():
+                    pass
+
+    def test_report(self):
+        knight = self.board.set_piece(Knight, WHITE, 'b', 1)
+        with profiling.profile() as stats:
+            knight.get_legal_moves()
+        self.assertIn('Knight.get_attack_vectors', stats.report())
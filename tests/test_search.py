@@ -0,0 +1,252 @@
+from timeit import default_timer
+
+from botetourt import fen, movegen, search
+
+from tests import TestCase
+
+
+INFINITY = 1000000
+
+
+class EvaluateTests(TestCase):
+    def test_balanced(self):
+        self.assertEqual(0, search.evaluate(fen.loads(fen.STARTING_POSITION)))
+
+    def test_side_to_move(self):
+        board = fen.loads('4k3/8/8/8/8/8/8/3QK3 w - - 0 1')
+        self.assertEqual(900, search.evaluate(board))
+        board = fen.loads('4k3/8/8/8/8/8/8/3QK3 b - - 0 1')
+        self.assertEqual(-900, search.evaluate(board))
+
+
+class QuiescenceTests(TestCase):
+    def quiescence(self, position):
+        board = fen.loads(position)
+        score = search.quiescence(board, -INFINITY, INFINITY)
+        self.assertEqual(position, fen.dumps(board))
+        return score
+
+    def test_quiet_position_is_static_eval(self):
+        self.assertEqual(0, self.quiescence(fen.STARTING_POSITION))
+
+    def test_wins_hanging_piece(self):
+        self.assertEqual(
+            500, self.quiescence('4k3/8/8/3q4/8/8/8/3RK3 w - - 0 1'))
+
+    def test_resolves_exchanges(self):
+        # RxP loses the rook to the defending pawn, so white stands pat
+        self.assertEqual(
+            500 - 200, self.quiescence('4k3/8/2p5/3p4/8/8/8/3RK3 w - - 0 1'))
+
+    def test_opponent_recaptures(self):
+        # NxN is met by PxN, so the trade leaves white a pawn down as before
+        self.assertEqual(
+            -100, self.quiescence('4k3/8/2p5/3n4/8/4N3/8/4K3 w - - 0 1'))
+
+
+class SearchTests(TestCase):
+    def test_finds_mate(self):
+        position = '6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1'
+        board = fen.loads(position)
+        info = search.search(board, 2)
+        self.assertEqual(search.MATE - 1, info['score'])
+        self.assertEqual([('a', 1, 'a', 8)], info['pv'])
+        self.assertEqual(position, fen.dumps(board))
+
+    def test_wins_material(self):
+        info = search.search(fen.loads('4k3/8/8/3q4/8/8/8/3RK3 w - - 0 1'), 1)
+        self.assertEqual(('d', 1, 'd', 5), info['pv'][0])
+
+    def test_iterates_each_depth(self):
+        searcher = search.Search(fen.loads(fen.STARTING_POSITION))
+        infos = list(searcher.iterate(2))
+        self.assertEqual([1, 2], [info['depth'] for info in infos])
+        self.assertTrue(infos[0]['nodes'] < infos[1]['nodes'])
+
+    def test_stalemate(self):
+        board = fen.loads('7k/5Q2/6K1/8/8/8/8/8 b - - 0 1')
+        self.assertEqual(0, search.search(board, 1)['score'])
+
+    def test_should_stop(self):
+        board = fen.loads(fen.STARTING_POSITION)
+        self.assertIsNone(search.search(board, 3, should_stop=lambda: True))
+        self.assertEqual(fen.STARTING_POSITION, fen.dumps(board))
+
+    def test_reports_nps_and_ebf(self):
+        searcher = search.Search(fen.loads(fen.STARTING_POSITION))
+        infos = list(searcher.iterate(2))
+        self.assertIsNone(infos[0]['ebf'])
+        self.assertTrue(infos[1]['ebf'] > 1)
+        self.assertTrue(all(info['nps'] > 0 for info in infos))
+
+    def test_default_depth(self):
+        board = fen.loads('4k3/8/8/3q4/8/8/8/3RK3 w - - 0 1')
+        self.assertEqual(search.DEFAULT_DEPTH, search.search(board)['depth'])
+        info, = search.search_many([board])
+        self.assertEqual(search.DEFAULT_DEPTH, info['depth'])
+        # Limits allow deeper searches
+        info = search.search(board, limits=search.Limits(max_nodes=100000,
+                                                         soft_time=0.5))
+        self.assertTrue(info['depth'] > search.DEFAULT_DEPTH)
+
+    def test_multipv(self):
+        board = fen.loads('4k3/8/8/3q4/8/8/8/3RK3 w - - 0 1')
+        info = search.search(board, 2, multipv=3)
+        lines = info['lines']
+        self.assertEqual(3, len(lines))
+        self.assertEqual(('d', 1, 'd', 5), lines[0]['pv'][0])
+        self.assertEqual(info['score'], lines[0]['score'])
+        scores = [line['score'] for line in lines]
+        self.assertEqual(sorted(scores, reverse=True), scores)
+        self.assertEqual(3, len(set(line['pv'][0] for line in lines)))
+
+    def test_multipv_scores_are_exact(self):
+        # Each line scores what a search of just its first move would
+        position = '4k3/8/8/3q4/8/8/8/3RK3 w - - 0 1'
+        for line in search.search(fen.loads(position), 2,
+                                  multipv=4)['lines']:
+            board = fen.loads(position)
+            board.make_move(*line['pv'][0])
+            self.assertEqual(line['score'], -search.search(board, 1)['score'])
+
+    def test_multipv_with_few_moves(self):
+        board = fen.loads('7k/8/8/8/8/8/8/K5Q1 b - - 0 1')
+        lines = search.search(board, 1, multipv=5)['lines']
+        self.assertEqual([('h', 8, 'h', 7)], [line['pv'][0] for line in lines])
+
+
+class TranspositionTableTests(TestCase):
+    def test_mate_scores_are_relative_to_position(self):
+        table = search.TranspositionTable()
+        table.store(1, 2, search.MATE - 5, search.EXACT, None, ply=3)
+        self.assertEqual(search.MATE - 2, table.get(1)[1])
+        self.assertEqual(search.MATE - 3, table.get(1, ply=1)[1])
+        table.store(2, 2, 50, search.LOWER, None, ply=3)
+        self.assertEqual((2, 50, search.LOWER, None), table.get(2, ply=1))
+
+    def test_starts_over_when_full(self):
+        table = search.TranspositionTable(maxsize=2)
+        table.store(1, 1, 0, search.EXACT, None)
+        table.store(2, 1, 0, search.EXACT, None)
+        table.store(2, 2, 0, search.EXACT, None)
+        self.assertEqual(2, len(table))
+        table.store(3, 1, 0, search.EXACT, None)
+        self.assertEqual(1, len(table))
+        self.assertIsNone(table.get(1))
+
+    def test_shared_table_saves_work(self):
+        board = fen.loads(fen.STARTING_POSITION)
+        table = search.TranspositionTable()
+        cold = search.search(board, 3, table=table)
+        warm = search.search(board, 3, table=table)
+        self.assertEqual(cold['score'], warm['score'])
+        self.assertTrue(warm['nodes'] < cold['nodes'])
+
+
+class SearchManyTests(TestCase):
+    def positions(self):
+        # Two knights defence, 4. Ng5 d5 5. exd5 Nxd5
+        board = fen.loads('r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/'
+                          'RNBQK2R w KQkq - 4 4')
+        positions = [fen.dumps(board)]
+        for move in [('f', 3, 'g', 5), ('d', 7, 'd', 5), ('e', 4, 'd', 5),
+                     ('f', 6, 'd', 5)]:
+            board.make_move(*move)
+            positions.append(fen.dumps(board))
+        return positions
+
+    def test_results_in_input_order(self):
+        positions = self.positions()
+        infos = search.search_many(positions, 2)
+        self.assertFalse(isinstance(infos, list))
+        for position, info in zip(positions, infos):
+            expected = search.search(fen.loads(position), 2)
+            self.assertEqual(expected['score'], info['score'])
+            self.assertEqual(expected['pv'][0], info['pv'][0])
+
+    def test_accepts_boards(self):
+        board = fen.loads('6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1')
+        info, = search.search_many([board], 2, multipv=2)
+        self.assertEqual(search.MATE - 1, info['score'])
+        self.assertEqual(2, len(info['lines']))
+
+    def test_warms_consecutive_positions(self):
+        positions = self.positions()
+        shared = sum(info['nodes']
+                     for info in search.search_many(positions, 3))
+        alone = sum(search.search(fen.loads(position), 3)['nodes']
+                    for position in positions)
+        self.assertTrue(shared < alone)
+
+
+class TimeManagementTests(TestCase):
+    def test_allocate_time(self):
+        soft, hard = search.allocate_time(60, moves_to_go=20, overhead=0)
+        self.assertEqual(3, soft)
+        self.assertEqual(3 * search.HARD_TIME_FACTOR, hard)
+
+    def test_allocate_time_with_increment(self):
+        soft, hard = search.allocate_time(30, increment=2, overhead=0)
+        self.assertEqual(30.0 / search.DEFAULT_MOVES_TO_GO + 2, soft)
+
+    def test_allocate_time_with_int_clock(self):
+        soft, hard = search.allocate_time(5, moves_to_go=40, overhead=0)
+        self.assertEqual(0.125, soft)
+        self.assertEqual(0.125 * search.HARD_TIME_FACTOR, hard)
+
+    def test_hard_time_never_exceeds_clock(self):
+        soft, hard = search.allocate_time(1.05, increment=5)
+        self.assertEqual(1.0, hard)
+        self.assertEqual(1.0, soft)
+        self.assertEqual((0, 0), search.allocate_time(0.01))
+
+    def test_limits_from_clock(self):
+        limits = search.Limits.from_clock(60, moves_to_go=20, max_nodes=10)
+        self.assertTrue(limits.soft_time < limits.hard_time)
+        self.assertEqual(10, limits.max_nodes)
+
+    def test_checks_every_interval(self):
+        calls = []
+
+        def should_stop():
+            calls.append(None)
+            return False
+
+        limits = search.Limits(check_interval=16)
+        searcher = search.Search(fen.loads(fen.STARTING_POSITION),
+                                 should_stop=should_stop, limits=limits)
+        list(searcher.iterate(2))
+        self.assertEqual((searcher.nodes + 15) // 16, len(calls))
+
+    def test_counts_quiescence_nodes(self):
+        # One root node and a quiescence node per move, plus the captures
+        board = fen.loads('4k3/8/2p5/3p4/8/8/8/3RK3 w - - 0 1')
+        moves = list(movegen.staged_moves(board))
+        self.assertTrue(search.search(board, 1)['nodes'] > 1 + len(moves))
+
+    def test_hard_time_includes_quiescence(self):
+        board = fen.loads('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/'
+                          'R3K2R w KQkq - 0 1')
+        start = default_timer()
+        search.search(board, limits=search.Limits(hard_time=0.05))
+        # Generous, as the machine running the tests may be busy
+        self.assertTrue(default_timer() - start < 0.5)
+
+    def test_max_nodes(self):
+        board = fen.loads(fen.STARTING_POSITION)
+        limits = search.Limits(max_nodes=200, check_interval=8)
+        infos = list(search.Search(board, limits=limits).iterate(10))
+        self.assertTrue(infos)
+        self.assertTrue(infos[-1]['nodes'] <= 200 + 8)
+        self.assertEqual(fen.STARTING_POSITION, fen.dumps(board))
+
+    def test_soft_time_stops_between_iterations(self):
+        board = fen.loads(fen.STARTING_POSITION)
+        info = search.search(board, limits=search.Limits(soft_time=0))
+        self.assertEqual(1, info['depth'])
+
+    def test_hard_time_stops_mid_iteration(self):
+        board = fen.loads(fen.STARTING_POSITION)
+        self.assertIsNone(search.search(board, limits=search.Limits(
+            hard_time=0)))
+        self.assertEqual(fen.STARTING_POSITION, fen.dumps(board))
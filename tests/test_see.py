@@ -0,0 +1,50 @@
+from botetourt import fen
+from botetourt.board import WHITE, BLACK
+from botetourt.see import attackers, see
+
+from tests import TestCase
+
+
+class SEETests(TestCase):
+    def assertSEE(self, position, move, expected):
+        self.assertEqual(expected, see(fen.loads(position), move))
+
+    def test_undefended(self):
+        self.assertSEE('4k3/8/8/3n4/4P3/8/8/4K3 w - - 0 1',
+                       ('e', 4, 'd', 5), 320)
+
+    def test_defended_pawn_with_rook(self):
+        self.assertSEE('4k3/8/2p5/3p4/8/8/8/3RK3 w - - 0 1',
+                       ('d', 1, 'd', 5), 100 - 500)
+
+    def test_equal_trade(self):
+        self.assertSEE('4k3/8/2p5/3n4/8/4N3/8/4K3 w - - 0 1',
+                       ('e', 3, 'd', 5), 0)
+
+    def test_xray(self):
+        # The rook behind the rook wins the pawn
+        self.assertSEE('1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1',
+                       ('e', 1, 'e', 5), 100)
+        self.assertSEE('1k2r3/1pp4p/p7/4p3/8/P5P1/1PP1R2P/2K1R3 w - - 0 1',
+                       ('e', 2, 'e', 5), 100)
+
+    def test_king_cannot_recapture_defended_square(self):
+        # The knight defends e4, so the king can't take the rook back
+        self.assertSEE('8/8/8/4k3/4p3/8/5N2/4RK2 w - - 0 1',
+                       ('e', 1, 'e', 4), 100)
+        self.assertSEE('8/8/8/3p4/4k3/8/8/3RK3 w - - 0 1',
+                       ('d', 1, 'd', 5), 100 - 500)
+
+    def test_en_passant(self):
+        self.assertSEE('4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1',
+                       ('e', 5, 'd', 6), 100)
+
+    def test_attackers(self):
+        board = fen.loads('4k3/8/2n5/3p4/4P3/5B2/8/3RK3 w - - 0 1')
+        self.assertEqual({'P', 'R'}, {piece.SYMBOL for piece in
+                                      attackers(board, ('d', 5), WHITE)})
+        self.assertEqual(['P'], [piece.SYMBOL for piece in
+                                 attackers(board, ('e', 4), BLACK)])
+        self.assertEqual({'R', 'B'}, {piece.SYMBOL for piece in
+                                           attackers(board, ('d', 5), WHITE,
+                                                     ignore={('e', 4)})})
@@ -0,0 +1,130 @@
+import json
+import socket
+import threading
+import time
+import unittest
+
+from botetourt.exc import AnalysisFailed, ServiceBusy
+from botetourt.service import AnalysisService, make_server
+
+
+BACK_RANK_MATE = '6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1'
+KIWIPETE = \
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'
+
+
+class AnalysisServiceTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.service = AnalysisService(workers=2, max_pending=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.service.close()
+
+    def test_streams_each_depth(self):
+        infos = list(self.service.analyze(BACK_RANK_MATE, depth=2))
+        self.assertEqual([1, 2], [info['depth'] for info in infos])
+        self.assertEqual(['a1a8'], infos[-1]['pv'])
+
+    def test_invalid_fen(self):
+        analysis = self.service.analyze('not a fen', depth=1)
+        with self.assertRaises(AnalysisFailed):
+            analysis.result()
+
+    def test_invalid_arguments(self):
+        for kwargs in [{'position': None}, {'depth': '3'}, {'depth': None},
+                       {'depth': 0}, {'depth': 10 ** 9}, {'depth': True},
+                       {'timeout': 'soon'}, {'timeout': -1}]:
+            arguments = dict(position=BACK_RANK_MATE, depth=1)
+            arguments.update(kwargs)
+            with self.assertRaises(ValueError):
+                self.service.analyze(**arguments)
+        # No slots were taken
+        self.assertEqual(1, self.service.analyze(
+            BACK_RANK_MATE, depth=1, block=False).result()['depth'])
+
+    def test_deadline(self):
+        start = time.time()
+        info = self.service.analyze(KIWIPETE, depth=20, timeout=0.5).result()
+        self.assertTrue(time.time() - start < 10)
+        self.assertTrue(info is None or info['depth'] < 20)
+
+    def test_cancel(self):
+        analysis = self.service.analyze(KIWIPETE, depth=20)
+        analysis.cancel()
+        start = time.time()
+        analysis.result()
+        self.assertTrue(time.time() - start < 10)
+
+    def test_backpressure(self):
+        first = self.service.analyze(KIWIPETE, depth=20)
+        second = self.service.analyze(KIWIPETE, depth=20)
+        try:
+            with self.assertRaises(ServiceBusy):
+                self.service.analyze(BACK_RANK_MATE, depth=1, block=False)
+            with self.assertRaises(ServiceBusy):
+                self.service.analyze(BACK_RANK_MATE, depth=1, wait=0.1)
+        finally:
+            first.cancel()
+            second.cancel()
+        first.result()
+        second.result()
+        self.assertEqual(1, self.service.analyze(
+            BACK_RANK_MATE, depth=1).result()['depth'])
+
+
+class AnalysisServerTests(unittest.TestCase):
+    def test_round_trip(self):
+        with AnalysisService(workers=1) as service:
+            server = make_server(service)
+            thread = threading.Thread(target=server.serve_forever)
+            thread.daemon = True
+            thread.start()
+            try:
+                client = socket.create_connection(server.server_address)
+                stream = client.makefile('rw')
+                stream.write(json.dumps({'fen': BACK_RANK_MATE,
+                                         'depth': 2}) + '\n')
+                stream.write('garbage\n')
+                stream.flush()
+
+                lines = [json.loads(stream.readline()) for _ in range(4)]
+                client.close()
+            finally:
+                server.shutdown()
+                server.server_close()
+
+        self.assertEqual([1, 2], [line['depth'] for line in lines[:2]])
+        self.assertEqual({'done': True}, lines[2])
+        self.assertIn('error', lines[3])
+
+    def test_malformed_request(self):
+        with AnalysisService(workers=1) as service:
+            server = make_server(service)
+            thread = threading.Thread(target=server.serve_forever)
+            thread.daemon = True
+            thread.start()
+            try:
+                client = socket.create_connection(server.server_address)
+                stream = client.makefile('rw')
+                for request in [{'fen': BACK_RANK_MATE, 'depth': 'x'},
+                                {'fen': 42, 'depth': 1},
+                                {'fen': BACK_RANK_MATE, 'depth': 1}]:
+                    stream.write(json.dumps(request) + '\n')
+                stream.flush()
+
+                lines = [json.loads(stream.readline()) for _ in range(4)]
+                client.close()
+            finally:
+                server.shutdown()
+                server.server_close()
+            workers_alive = all(process.is_alive()
+                                for process in service._workers)
+
+        self.assertIn('ValueError', lines[0]['error'])
+        self.assertIn('ValueError', lines[1]['error'])
+        # The worker still answers
+        self.assertEqual(1, lines[2]['depth'])
+        self.assertEqual({'done': True}, lines[3])
+        self.assertTrue(workers_alive)
@@ -0,0 +1,60 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from botetourt import tables
+
+from tests import TestCase
+
+
+class TablesTests(TestCase):
+    def test_artifact_is_up_to_date(self):
+        # Rebuild with `python -m botetourt.tables` if this fails
+        with open(tables.ARTIFACT, 'rb') as f:
+            self.assertEqual(tables.build(), f.read())
+
+    def test_rays(self):
+        rays = tables.rays()[('c', 3)]
+        self.assertEqual((('c', 4), ('c', 5), ('c', 6), ('c', 7), ('c', 8)),
+                         rays[(0, 1)])
+        self.assertEqual((('b', 2), ('a', 1)), rays[(-1, -1)])
+        self.assertEqual((), tables.rays()[('h', 8)][(1, 1)])
+
+    def test_jumps(self):
+        self.assertEqual({('b', 3), ('c', 2)},
+                         set(tables.knight_jumps()[('a', 1)]))
+        self.assertEqual({('a', 2), ('b', 2), ('b', 1)},
+                         set(tables.king_steps()[('a', 1)]))
+        self.assertEqual(8, len(tables.king_steps()[('d', 4)]))
+
+    def test_square_bits(self):
+        mask = tables.SQUARE_BITS[('a', 1)] | tables.SQUARE_BITS[('h', 8)]
+        self.assertEqual(1 | 1 << 63, mask)
+        self.assertEqual([('a', 1), ('h', 8)], tables.squares_in(mask))
+        self.assertEqual(2, tables.popcount(mask))
+        self.assertEqual(0, tables.popcount(0))
+
+    def test_missing_or_stale_artifact(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'tables.bin')
+        self.assertIsNone(tables._map(path))
+
+        with open(path, 'wb') as f:
+            f.write('BTTBL000' + tables.build()[len(tables.MAGIC):])
+        self.assertIsNone(tables._map(path))
+
+        tables.write(path)
+        self.assertEqual(tables.build(), tables._map(path)[:])
+
+    def test_board_import_only_loads_zobrist_keys(self):
+        code = ('import botetourt.board, mmap; '
+                'from botetourt import tables; '
+                'print(isinstance(tables._data, mmap.mmap), '
+                'tables._rays, tables._knight_jumps)')
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.check_output([sys.executable, '-c', code],
+                                         cwd=root)
+        self.assertEqual('(True, None, None)', output.strip())
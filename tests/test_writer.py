@@ -0,0 +1,111 @@
+import json
+from StringIO import StringIO
+
+from botetourt import fen, pgn
+from botetourt.search import MATE
+from botetourt.writer import (BufferedWriter, JSONLinesWriter, PGNWriter,
+                              Ply, analysis_record, format_score,
+                              history_line)
+
+from tests import TestCase
+
+
+class CountingFile(object):
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(data)
+
+
+class BufferedWriterTests(TestCase):
+    def test_writes_in_bulk(self):
+        f = CountingFile()
+        with BufferedWriter(f, buffer_size=10) as writer:
+            for _ in range(7):
+                writer.write('abc')
+            self.assertEqual(['abc' * 4], f.writes)
+        self.assertEqual(['abc' * 4, 'abc' * 3], f.writes)
+
+
+class JSONLinesWriterTests(TestCase):
+    def test_analysis_records(self):
+        board = fen.loads(fen.STARTING_POSITION)
+        infos = [{'depth': 1, 'score': 50, 'pv': [('e', 2, 'e', 4)]},
+                 {'depth': 2, 'score': 0, 'pv': ['d2d4', 'd7d5']}]
+        f = StringIO()
+        with JSONLinesWriter(f) as writer:
+            count = writer.write_records(analysis_record(board, info)
+                                         for info in infos)
+        self.assertEqual(2, count)
+
+        lines = f.getvalue().splitlines()
+        self.assertEqual(2, len(lines))
+        record = json.loads(lines[1])
+        self.assertEqual(fen.STARTING_POSITION, record['fen'])
+        self.assertEqual('d2d4', record['best'])
+        self.assertEqual(['d2d4', 'd7d5'], record['pv'])
+        self.assertEqual(2, record['depth'])
+
+    def test_format_score(self):
+        self.assertEqual('+0.35', format_score(35))
+        self.assertEqual('-1.00', format_score(-100))
+        self.assertEqual('#2', format_score(MATE - 3))
+        self.assertEqual('#-1', format_score(-MATE + 2))
+
+
+class PGNWriterTests(TestCase):
+    def write_game(self, board, plies, **kwargs):
+        f = StringIO()
+        with PGNWriter(f, buffer_size=16) as writer:
+            writer.write_game(board, plies, **kwargs)
+        return f.getvalue()
+
+    def test_round_trip(self):
+        source = list(pgn.read_games(StringIO(
+            '[Event "Paris"]\n\n1. e4 e5 2. Nf3 d6 3. d4 Bg4 4. dxe5 Bxf3 '
+            '5. Qxf3 dxe5 6. Bc4 Nf6 7. Qb3 Qe7 8. Nc3 c6 9. Bg5 b5 '
+            '10. Nxb5 cxb5 11. Bxb5+ Nbd7 12. O-O-O Rd8 13. Rxd7 Rxd7 '
+            '14. Rd1 Qe6 15. Bxd7+ Nxd7 16. Qb8+ Nxb8 17. Rd8# 1-0\n')))[0]
+
+        def moves(board):
+            for san in source.moves:
+                yield pgn.parse_san(board, san)[:4]
+
+        board = source.new_board()
+        text = self.write_game(board, moves(board), headers=source.headers,
+                               result=source.result)
+        self.assertTrue(all(len(line) < 80 for line in text.splitlines()))
+
+        game = list(pgn.read_games(StringIO(text)))[0]
+        self.assertEqual(source.moves, game.moves)
+        self.assertEqual('1-0', game.result)
+        self.assertEqual('Paris', game.headers['Event'])
+        self.assertEqual(fen.dumps(board), fen.dumps(
+            fen.loads('1n1Rkb1r/p4ppp/4q3/4p1B1/4P3/8/PPP2PPP/2K5 b k - 1 17')))
+
+    def test_annotations_and_variations(self):
+        board = fen.loads(fen.STARTING_POSITION)
+
+        # A variation explored on a copy of the board
+        other = board.copy()
+        other.make_move('d', 2, 'd', 4)
+        other.make_move('d', 7, 'd', 5)
+
+        plies = [Ply(('e', 2, 'e', 4), None, [history_line(other)]),
+                 Ply(('e', 7, 'e', 5),
+                     {'depth': 3, 'score': -25, 'pv': ['c7c5']}, ()),
+                 ('g', 1, 'f', 3)]
+        text = self.write_game(board, plies)
+
+        self.assertEqual('[Result "*"]\n\n'
+                         '1. e4 (1. d4 d5) 1... e5 {-0.25/3 c5} 2. Nf3 *\n\n',
+                         text)
+        self.assertEqual(3, len(board.history))
+
+    def test_setup_position(self):
+        board = fen.loads('4k3/8/8/8/8/8/4P3/4K3 b - - 0 1')
+        text = self.write_game(board, [('e', 8, 'd', 8)])
+        self.assertIn('[SetUp "1"]\n', text)
+        self.assertIn('[FEN "4k3/8/8/8/8/8/4P3/4K3 b - - 0 1"]\n', text)
+        self.assertIn('\n1... Kd8 *\n', text)